@@ -0,0 +1,86 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from engine import TREE, BURNING, BURNED, ForestFireEngine
+
+PARAMETERS = ['forest_density', 'ignition_probability', 'replacement_probability', 'burnout_probability']
+COUNTED_STATES = {'tree': TREE, 'burning': BURNING, 'burned': BURNED}
+
+
+def parameter_grid(forest_density, ignition_probability, replacement_probability, burnout_probability, seeds):
+    values = [forest_density, ignition_probability, replacement_probability, burnout_probability]
+    return [dict(zip(PARAMETERS, combination), seed=seed)
+            for combination in itertools.product(*values)
+            for seed in seeds]
+
+
+def run_simulation(params, steps, dimensions, use_moore=False, sparse=False):
+    engine = ForestFireEngine(dimensions, use_moore=use_moore, sparse=sparse, **params)
+    counts = np.empty((steps + 1, 4), dtype=np.uint32)
+    counts[0] = engine.counts()
+    for step in range(1, steps + 1):
+        engine.step()
+        counts[step] = engine.counts()
+    return counts
+
+
+def _run_indexed(job):
+    index, params, steps, dimensions, use_moore, sparse = job
+    return index, run_simulation(params, steps, dimensions, use_moore, sparse)
+
+
+def run_sweep(runs, steps, dimensions, use_moore=False, workers=None, sparse=False):
+    columns = {name: np.array([run[name] for run in runs], dtype=np.float64) for name in PARAMETERS}
+    columns['seed'] = np.array([run['seed'] for run in runs], dtype=np.int64)
+    for name in COUNTED_STATES:
+        columns[name] = np.empty((len(runs), steps + 1), dtype=np.uint32)
+
+    jobs = [(index, run, steps, tuple(dimensions), use_moore, sparse) for index, run in enumerate(runs)]
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, counts in executor.map(_run_indexed, jobs, chunksize=chunksize):
+            for name, state in COUNTED_STATES.items():
+                columns[name][index] = counts[:, state]
+    return columns
+
+
+def save_sweep(path, columns, dimensions, use_moore):
+    # One column per parameter plus a (runs, steps + 1) matrix per counted state
+    np.savez_compressed(path, dimensions=np.array(dimensions), use_moore=np.array(use_moore), **columns)
+
+
+def load_sweep(path):
+    with np.load(path) as sweep:
+        return {name: sweep[name] for name in sweep.files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless forest fire parameter sweep")
+    parser.add_argument('--density', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--ignition', type=float, nargs='+', default=[0.001])
+    parser.add_argument('--replacement', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--burnout', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--seeds', type=int, default=10, help="number of seeds per parameter combination")
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--size', type=int, nargs=2, default=[100, 100], metavar=('ROWS', 'COLS'))
+    parser.add_argument('--moore', action='store_true', help="use the Moore neighborhood")
+    parser.add_argument('--sparse', action='store_true', help="track only the fire front instead of the whole grid")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep.npz')
+    args = parser.parse_args()
+
+    runs = parameter_grid(args.density, args.ignition, args.replacement, args.burnout, range(args.seeds))
+    print(f"Running {len(runs)} simulations of {args.steps} steps on a {args.size[0]}x{args.size[1]} grid...")
+    start = time.perf_counter()
+    columns = run_sweep(runs, args.steps, args.size, args.moore, args.workers, args.sparse)
+    elapsed = time.perf_counter() - start
+    save_sweep(args.output, columns, args.size, args.moore)
+    print(f"Finished in {elapsed:.2f} s ({len(runs) / elapsed:.1f} runs/s), saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
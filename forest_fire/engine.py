@@ -0,0 +1,198 @@
+import numpy as np
+
+EMPTY = 0
+TREE = 1
+BURNING = 2
+BURNED = 3
+
+STATE_DTYPE = np.uint8
+
+VON_NEUMANN_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+MOORE_OFFSETS = VON_NEUMANN_OFFSETS + [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def generate_forest_fire_data(dimensions, density, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    return (rng.random(dimensions, dtype=np.float32) < density).astype(STATE_DTYPE)
+
+
+class StepBuffers:
+    # Full-grid temporaries of a dense step, allocated once and reused by every step
+    def __init__(self, shape):
+        self.uniform = np.empty(shape, dtype=np.float32)
+        self.burning = np.empty(shape, dtype=bool)
+        self.tree = np.empty(shape, dtype=bool)
+        self.neighbors = np.empty(shape, dtype=bool)
+        self.event = np.empty(shape, dtype=bool)
+
+
+def chance(uniform, probability, out=None):
+    # uniform is in [0, 1), so probabilities <= 0 never and >= 1 always happen
+    return np.less(uniform, np.float32(probability), out=out)
+
+
+def burning_neighbors(burning, use_moore=False, out=None):
+    # OR of the shifted burning masks; cells outside the grid never burn
+    if out is None:
+        mask = np.zeros_like(burning)
+    else:
+        mask = out
+        mask.fill(False)
+    mask[1:, :] |= burning[:-1, :]
+    mask[:-1, :] |= burning[1:, :]
+    mask[:, 1:] |= burning[:, :-1]
+    mask[:, :-1] |= burning[:, 1:]
+    if use_moore:
+        mask[1:, 1:] |= burning[:-1, :-1]
+        mask[1:, :-1] |= burning[:-1, 1:]
+        mask[:-1, 1:] |= burning[1:, :-1]
+        mask[:-1, :-1] |= burning[1:, 1:]
+    return mask
+
+
+def step_forest_fire(data, ignition_probability, replacement_probability, burnout_probability,
+                     use_moore=False, rng=None, out=None, buffers=None):
+    rng = np.random.default_rng() if rng is None else rng
+    buffers = StepBuffers(data.shape) if buffers is None else buffers
+    new = np.empty(data.shape, dtype=STATE_DTYPE) if out is None else out
+    # One uniform draw per cell, each cell uses it only for the event of its own state
+    uniform = rng.random(dtype=np.float32, out=buffers.uniform)
+    burning = np.equal(data, BURNING, out=buffers.burning)
+    tree = np.equal(data, TREE, out=buffers.tree)
+    event = buffers.event
+
+    # The next state is summed from 0/1 masks (bools viewed as bytes): trees stay TREE (1) or
+    # ignite to BURNING (2), burning cells stay BURNING (2) or burn out to BURNED (3),
+    # EMPTY and BURNED cells become EMPTY (0) or regrow to TREE (1)
+    np.add(tree.view(np.uint8), burning.view(np.uint8), out=new)
+    new += burning.view(np.uint8)
+    ignites = burning_neighbors(burning, use_moore, out=buffers.neighbors)
+    ignites |= chance(uniform, ignition_probability, out=event)
+    ignites &= tree
+    new += ignites.view(np.uint8)
+    burns_out = chance(uniform, burnout_probability, out=event)
+    burns_out &= burning
+    new += burns_out.view(np.uint8)
+    occupied = np.logical_or(tree, burning, out=buffers.neighbors)
+    regrows = np.greater(chance(uniform, replacement_probability, out=event), occupied, out=event)
+    new += regrows.view(np.uint8)
+    return new
+
+
+def neighbor_indices(indices, shape, use_moore=False):
+    rows, cols = np.divmod(indices, shape[1])
+    neighbors = []
+    for row_offset, col_offset in (MOORE_OFFSETS if use_moore else VON_NEUMANN_OFFSETS):
+        r = rows + row_offset
+        c = cols + col_offset
+        valid = (r >= 0) & (r < shape[0]) & (c >= 0) & (c < shape[1])
+        neighbors.append(r[valid] * shape[1] + c[valid])
+    return np.concatenate(neighbors)
+
+
+def sample_events(rng, size, probability):
+    # A uniformly random subset of Binomial(size, p) cells is the same as picking every
+    # cell independently with probability p; callers reject cells in the wrong state
+    count = rng.binomial(size, min(max(probability, 0.0), 1.0))
+    return rng.choice(size, count, replace=False)
+
+
+class SparseFront:
+    def __init__(self, data):
+        flat = data.reshape(-1)
+        self.burning = np.flatnonzero(flat == BURNING)
+        self.burned = np.flatnonzero(flat == BURNED)
+        self.counts = np.bincount(flat, minlength=4)[:4].astype(np.int64)
+
+    def step(self, data, ignition_probability, replacement_probability, burnout_probability,
+             use_moore=False, rng=None):
+        rng = np.random.default_rng() if rng is None else rng
+        # Updates data in place, touching only the fire front and the sampled events
+        flat = data.reshape(-1)
+
+        candidates = np.concatenate([neighbor_indices(self.burning, data.shape, use_moore),
+                                     sample_events(rng, flat.size, ignition_probability)])
+        ignited = np.unique(candidates[flat[candidates] == TREE])
+        burned_out = self.burning[rng.random(self.burning.size) < burnout_probability]
+        regrown = sample_events(rng, flat.size, replacement_probability)
+        regrown_empty = regrown[flat[regrown] == EMPTY]
+        regrown_burned = regrown[flat[regrown] == BURNED]
+
+        flat[self.burned] = EMPTY
+        flat[regrown_empty] = TREE
+        flat[regrown_burned] = TREE
+        flat[burned_out] = BURNED
+        flat[ignited] = BURNING
+
+        still_burning = np.setdiff1d(self.burning, burned_out, assume_unique=True)
+        self.burning = np.union1d(still_burning, ignited)
+        self.counts += [self.burned.size - regrown_empty.size - regrown_burned.size,
+                        regrown_empty.size + regrown_burned.size - ignited.size,
+                        ignited.size - burned_out.size,
+                        burned_out.size - self.burned.size]
+        self.burned = burned_out
+        return data
+
+
+class ForestFireEngine:
+    def __init__(self, dimensions=(100, 100), forest_density=0.5, ignition_probability=0.001,
+                 replacement_probability=0.05, burnout_probability=0.2, use_moore=False, sparse=False,
+                 seed=None):
+        self.dimensions = tuple(dimensions)
+        self.forest_density = forest_density
+        self.ignition_probability = ignition_probability
+        self.replacement_probability = replacement_probability
+        self.burnout_probability = burnout_probability
+        self.use_moore = use_moore
+        self.sparse = sparse
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+
+        self._buffer = np.empty(self.dimensions, dtype=STATE_DTYPE)
+        self._buffers = StepBuffers(self.dimensions)
+        self.reset()
+
+    def reset(self, data=None):
+        if data is None:
+            data = generate_forest_fire_data(self.dimensions, self.forest_density, self.rng)
+        # Always a private copy: both step modes overwrite the grid they are given
+        self.data = np.array(data, dtype=STATE_DTYPE, copy=True, order='C')
+        if self.data.shape != self.dimensions:
+            self.dimensions = self.data.shape
+            self._buffer = np.empty(self.dimensions, dtype=STATE_DTYPE)
+            self._buffers = StepBuffers(self.dimensions)
+        self._front = None
+        self.steps = 0
+        return self.data
+
+    def step(self):
+        if self.sparse:
+            return self._step_sparse()
+        # The front index goes stale as soon as the dense engine touches the grid
+        self._front = None
+        new = step_forest_fire(self.data, self.ignition_probability, self.replacement_probability,
+                               self.burnout_probability, self.use_moore, self.rng,
+                               out=self._buffer, buffers=self._buffers)
+        # Double buffering: the previous grid becomes the next output buffer
+        self._buffer = self.data
+        self.data = new
+        self.steps += 1
+        return self.data
+
+    def _step_sparse(self):
+        if self._front is None:
+            self._front = SparseFront(self.data)
+        self._front.step(self.data, self.ignition_probability, self.replacement_probability,
+                         self.burnout_probability, self.use_moore, self.rng)
+        self.steps += 1
+        return self.data
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+        return self.data
+
+    def counts(self):
+        if self._front is not None:
+            return self._front.counts.copy()
+        return np.bincount(self.data.ravel(), minlength=4)[:4]
@@ -1,13 +1,13 @@
+import math
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 import tkinter as tk
+from tkinter import filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-
-EMPTY = 0
-TREE = 1
-BURNING = 2
-BURNED = 3
+from engine import STATE_DTYPE, StepBuffers, generate_forest_fire_data, step_forest_fire
+from recording import HistoryReplay
 
 class ForestFireSimulator:
     def __init__(self, root):
@@ -22,10 +22,17 @@ class ForestFireSimulator:
         self.update_interval = 50
         self.running = False
         self.use_moore = False
+        self.downsample = True
+        self.rng = np.random.default_rng()
+        self.simulation_time = 0.0
+        self.render_time = 0.0
+        self.replay = None
+        self.replay_step = 0
         
         self.setup_gui()
         self.setup_plot()
         self.data = self.generate_forest_fire_data((100, 100), self.forest_density)
+        self.reset_buffers()
         self.update_plot()
         
     def setup_gui(self):
@@ -78,62 +85,150 @@ class ForestFireSimulator:
             command=self.toggle_moore
         )
         self.moore_checkbox.pack(pady=5)
+
+        self.downsample_var = tk.BooleanVar(value=self.downsample)
+        tk.Checkbutton(
+            control_frame,
+            text="Downsample to Canvas",
+            variable=self.downsample_var,
+            command=self.toggle_downsample
+        ).pack(pady=5)
         
         # Buttons
         tk.Button(control_frame, text="Reset", command=self.reset_simulation).pack(pady=5)
         self.start_stop_button = tk.Button(control_frame, text="Start", command=self.toggle_simulation)
         self.start_stop_button.pack(pady=5)
 
+        # Recording playback
+        tk.Button(control_frame, text="Open Recording", command=self.open_recording).pack(pady=5)
+        tk.Button(control_frame, text="Close Recording", command=self.close_recording).pack(pady=5)
+        tk.Label(control_frame, text="Recording Step:").pack()
+        self.step_slider = tk.Scale(control_frame, from_=0, to=0, orient=tk.HORIZONTAL,
+                                    command=self.seek_recording, state=tk.DISABLED)
+        self.step_slider.pack()
+
+        self.frame_time_label = tk.Label(control_frame, justify=tk.LEFT, font='TkFixedFont')
+        self.frame_time_label.pack(pady=5)
+
     def setup_plot(self):
         self.fig = Figure(figsize=(6, 6))
         self.ax = self.fig.add_subplot(111)
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
         self.canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+        # A single animated image artist, redrawn by blitting on every tick
+        cmap = plt.cm.colors.ListedColormap(['#3b2507', 'green', 'orange', 'black'])
+        self.image = self.ax.imshow(np.zeros((1, 1)), cmap=cmap, interpolation='nearest',
+                                    vmin=0, vmax=3, animated=True)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        # Full redraws (first show, resize) skip animated artists, so grab the empty axes and paint the image
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.image)
         
     def generate_forest_fire_data(self, dimensions, density):
-        rows, cols = dimensions
-        data = np.random.rand(rows, cols) < density
-        return data.astype(int)
+        return generate_forest_fire_data(dimensions, density, self.rng)
+
+    def reset_buffers(self):
+        # Step temporaries and the next grid are sized for the current grid and reused by every step
+        self.next_data = np.empty(self.data.shape, dtype=STATE_DTYPE)
+        self.step_buffers = StepBuffers(self.data.shape)
     
+    def downsample_frame(self, data):
+        if not self.downsample:
+            return data
+        # Never draw more cells than there are pixels in the axes
+        step = math.ceil(max(data.shape[0] / max(self.ax.bbox.height, 1),
+                             data.shape[1] / max(self.ax.bbox.width, 1)))
+        return data[::step, ::step] if step > 1 else data
+
     def update_plot(self):
-        self.ax.clear()
-        cmap = plt.cm.colors.ListedColormap(['#3b2507', 'green', 'orange', 'black'])
-        self.ax.imshow(self.data, cmap=cmap, interpolation='nearest', vmin=0, vmax=3)
-        self.canvas.draw()
+        start = time.perf_counter()
+        frame = self.downsample_frame(self.data)
+        rows, cols = self.data.shape
+        extent = (-0.5, cols - 0.5, rows - 0.5, -0.5)
+
+        resized = frame.shape != self.image.get_array().shape or extent != tuple(self.image.get_extent())
+        self.image.set_data(frame)
+        if resized or self.background is None:
+            self.image.set_extent(extent)
+            self.ax.set_xlim(extent[0], extent[1])
+            self.ax.set_ylim(extent[2], extent[3])
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.image)
+            self.canvas.blit(self.ax.bbox)
+        self.render_time = time.perf_counter() - start
+        self.update_frame_time_label()
+
+    def update_frame_time_label(self):
+        self.frame_time_label.config(
+            text=f"Simulation: {self.simulation_time * 1000:6.1f} ms\nRender:     {self.render_time * 1000:6.1f} ms"
+        )
     
     def apply_rules(self):
-        data_copy = np.copy(self.data)
-        for i in range(self.data.shape[0]):
-            for j in range(self.data.shape[1]):
-                if self.data[i, j] == TREE:
-                    has_burning_neighbor = False
-                    if (i > 0 and self.data[i-1, j] == BURNING) or \
-                       (i < self.data.shape[0]-1 and self.data[i+1, j] == BURNING) or \
-                       (j > 0 and self.data[i, j-1] == BURNING) or \
-                       (j < self.data.shape[1]-1 and self.data[i, j+1] == BURNING):
-                        has_burning_neighbor = True
-                    if self.use_moore:
-                        if (i > 0 and j > 0 and self.data[i-1, j-1] == BURNING) or \
-                           (i > 0 and j < self.data.shape[1]-1 and self.data[i-1, j+1] == BURNING) or \
-                           (i < self.data.shape[0]-1 and j > 0 and self.data[i+1, j-1] == BURNING) or \
-                           (i < self.data.shape[0]-1 and j < self.data.shape[1]-1 and self.data[i+1, j+1] == BURNING):
-                            has_burning_neighbor = True
-                    if has_burning_neighbor or np.random.rand() < self.ignition_probability:
-                        data_copy[i, j] = BURNING
-                elif self.data[i, j] == EMPTY or self.data[i, j] == BURNED:
-                    if np.random.rand() < self.replacement_probability:
-                        data_copy[i, j] = TREE
-                    else:
-                        data_copy[i, j] = EMPTY
-                elif self.data[i, j] == BURNING and np.random.rand() < self.burnout_probability:
-                    data_copy[i, j] = BURNED
-        self.data = data_copy
+        start = time.perf_counter()
+        new = step_forest_fire(self.data, self.ignition_probability, self.replacement_probability,
+                               self.burnout_probability, self.use_moore, self.rng,
+                               out=self.next_data, buffers=self.step_buffers)
+        # Double buffering: the previous grid becomes the next output buffer
+        self.next_data, self.data = self.data, new
+        self.simulation_time = time.perf_counter() - start
     
     def update(self):
         if self.running:
-            self.apply_rules()
-            self.update_plot()
+            if self.replay is not None:
+                if self.replay_step + 1 >= len(self.replay):
+                    self.toggle_simulation()
+                    return
+                self.step_slider.set(self.replay_step + 1)
+                self.seek_recording(self.replay_step + 1)
+            else:
+                self.apply_rules()
+                self.update_plot()
             self.root.after(self.update_interval, self.update)
+
+    def open_recording(self):
+        path = filedialog.askopenfilename(filetypes=[("Forest fire recording", "*.ffh"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            replay = HistoryReplay(path)
+        except (OSError, ValueError) as error:
+            print(f"Cannot open recording: {error}")
+            return
+        if len(replay) == 0:
+            print("The recording is empty.")
+            return
+        self.close_recording()
+        self.replay = replay
+        self.replay_step = -1
+        self.step_slider.config(state=tk.NORMAL, to=len(replay) - 1)
+        self.step_slider.set(0)
+        self.seek_recording(0)
+
+    def close_recording(self):
+        if self.replay is None:
+            return
+        self.replay.close()
+        self.replay = None
+        self.step_slider.set(0)
+        self.step_slider.config(state=tk.DISABLED, to=0)
+        self.reset_simulation()
+
+    def seek_recording(self, value):
+        step = int(float(value))
+        # Scale.set() also fires this callback, so repeated requests for the same step are ignored
+        if self.replay is None or step == self.replay_step:
+            return
+        start = time.perf_counter()
+        self.data = self.replay[step]
+        self.replay_step = step
+        self.simulation_time = time.perf_counter() - start
+        self.update_plot()
     
     def toggle_simulation(self):
         self.running = not self.running
@@ -146,8 +241,17 @@ class ForestFireSimulator:
     def toggle_moore(self):
         self.use_moore = self.moore_var.get()
     
+    def toggle_downsample(self):
+        self.downsample = self.downsample_var.get()
+        self.update_plot()
+    
     def reset_simulation(self):
+        if self.replay is not None:
+            self.step_slider.set(0)
+            self.seek_recording(0)
+            return
         self.data = self.generate_forest_fire_data((100, 100), self.forest_density)
+        self.reset_buffers()
         self.update_plot()
     
     def update_density(self, value):
@@ -0,0 +1,160 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from engine import STATE_DTYPE, ForestFireEngine
+
+# File layout: a fixed header followed by one 2-bit packed frame per step.
+# Frames have a constant size, so seeking to any step is a single offset computation.
+MAGIC = b'FFHIST01'
+HEADER = np.dtype([('magic', 'S8'), ('rows', '<u4'), ('cols', '<u4'), ('steps', '<u8'), ('reserved', '<u8')])
+
+
+def frame_size(dimensions):
+    rows, cols = dimensions
+    return (rows * cols + 3) // 4
+
+
+def pack_states(data):
+    flat = data.reshape(-1).astype(np.uint8, copy=False)
+    padded = np.zeros(frame_size(data.shape) * 4, dtype=np.uint8)
+    padded[:flat.size] = flat
+    quads = padded.reshape(-1, 4)
+    return quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+
+
+def unpack_states(packed, dimensions):
+    rows, cols = dimensions
+    quads = np.empty((packed.size, 4), dtype=STATE_DTYPE)
+    for i in range(4):
+        np.bitwise_and(packed >> (2 * i), 3, out=quads[:, i])
+    return quads.reshape(-1)[:rows * cols].reshape(rows, cols)
+
+
+class HistoryRecorder:
+    def __init__(self, path, dimensions, chunk_steps=256):
+        self.path = path
+        self.dimensions = tuple(dimensions)
+        self.chunk_steps = chunk_steps
+        self.frame_bytes = frame_size(self.dimensions)
+        self.steps = 0
+        self.capacity = 0
+        self.frames = None
+
+        header = np.zeros((), dtype=HEADER)
+        header['magic'] = MAGIC
+        header['rows'], header['cols'] = self.dimensions
+        with open(path, 'wb') as file:
+            file.write(header.tobytes())
+        # The step count in the header is kept current after every frame, so a run that is
+        # interrupted before close() still replays exactly the frames that were written
+        self.header = np.memmap(path, dtype=HEADER, mode='r+', shape=(1,))
+
+    def _grow(self):
+        # Extend the file by a whole chunk and remap it, instead of resizing on every step
+        if self.frames is not None:
+            self.frames.flush()
+            del self.frames
+        self.capacity += self.chunk_steps
+        with open(self.path, 'r+b') as file:
+            file.truncate(HEADER.itemsize + self.capacity * self.frame_bytes)
+        self.frames = np.memmap(self.path, dtype=np.uint8, mode='r+', offset=HEADER.itemsize,
+                                shape=(self.capacity, self.frame_bytes))
+
+    def append(self, data):
+        if data.shape != self.dimensions:
+            raise ValueError(f"Expected a grid of shape {self.dimensions}, got {data.shape}")
+        if self.steps == self.capacity:
+            self._grow()
+        self.frames[self.steps] = pack_states(data)
+        self.steps += 1
+        self.header['steps'] = self.steps
+
+    def close(self):
+        if self.header is None:
+            return
+        if self.frames is not None:
+            self.frames.flush()
+            del self.frames
+            self.frames = None
+        self.header.flush()
+        del self.header
+        self.header = None
+        # Drop the unused tail of the last chunk
+        with open(self.path, 'r+b') as file:
+            file.truncate(HEADER.itemsize + self.steps * self.frame_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoryReplay:
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if header.size == 0 or header['magic'][0] != MAGIC:
+            raise ValueError(f"'{path}' is not a forest fire recording")
+        self.dimensions = (int(header['rows'][0]), int(header['cols'][0]))
+        self.frame_bytes = frame_size(self.dimensions)
+        # The header counts written frames even for recordings that were not closed cleanly,
+        # the zero-filled tail of their last chunk is not part of the run. A file cut short
+        # (e.g. by a full disk) replays the frames it still holds completely.
+        complete = (os.path.getsize(path) - HEADER.itemsize) // self.frame_bytes
+        self.steps = min(int(header['steps'][0]), complete)
+        self.frames = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.itemsize,
+                                shape=(self.steps, self.frame_bytes)) if self.steps else None
+
+    def __len__(self):
+        return self.steps
+
+    def __getitem__(self, step):
+        if not -self.steps <= step < self.steps:
+            raise IndexError(f"Step {step} out of range for a recording of {self.steps} steps")
+        return unpack_states(np.asarray(self.frames[step]), self.dimensions)
+
+    def close(self):
+        self.frames = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record_run(path, engine, steps, chunk_steps=256):
+    with HistoryRecorder(path, engine.data.shape, chunk_steps) as recorder:
+        recorder.append(engine.data)
+        for _ in range(steps):
+            recorder.append(engine.step())
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a headless forest fire run for later replay")
+    parser.add_argument('output')
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--size', type=int, nargs=2, default=[100, 100], metavar=('ROWS', 'COLS'))
+    parser.add_argument('--density', type=float, default=0.5)
+    parser.add_argument('--ignition', type=float, default=0.001)
+    parser.add_argument('--replacement', type=float, default=0.05)
+    parser.add_argument('--burnout', type=float, default=0.2)
+    parser.add_argument('--moore', action='store_true', help="use the Moore neighborhood")
+    parser.add_argument('--sparse', action='store_true', help="track only the fire front instead of the whole grid")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    engine = ForestFireEngine(args.size, args.density, args.ignition, args.replacement, args.burnout,
+                              args.moore, args.sparse, args.seed)
+    start = time.perf_counter()
+    record_run(args.output, engine, args.steps)
+    elapsed = time.perf_counter() - start
+    print(f"Recorded {args.steps} steps in {elapsed:.2f} s to '{args.output}' "
+          f"({os.path.getsize(args.output) / 2**20:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import numpy as np
+
+# Derivatives take the activation's output, not its input
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def sigmoid_derivative(x):
+    return x * (1 - x)
+
+
+def tanh(x):
+    return np.tanh(x)
+
+
+def tanh_derivative(x):
+    return 1 - x ** 2
+
+
+def relu(x):
+    return np.maximum(0, x)
+
+
+def relu_derivative(x):
+    return np.where(x <= 0, 0, 1)
+
+
+def signum(x):
+    return np.sign(x)
+
+
+def signum_derivative(x):
+    return np.ones_like(x)
+
+
+ACTIVATIONS = {
+    'sigmoid': (sigmoid, sigmoid_derivative),
+    'tanh': (tanh, tanh_derivative),
+    'relu': (relu, relu_derivative),
+    'signum': (signum, signum_derivative),
+}
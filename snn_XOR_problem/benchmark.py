@@ -0,0 +1,136 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from layer import Layer
+from neural_network import NeuralNetwork
+
+XOR_INPUTS = np.array([[0, 0], [0, 1], [1, 0], [1, 1]], dtype=np.float64)
+XOR_TARGETS = np.array([[0], [1], [1], [0]], dtype=np.float64)
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def build_network(hidden, activation, learning_rate, optimizer, epochs, batch_size, target_error):
+    # Hidden layers use the benchmarked activation, the single output neuron stays sigmoid for 0/1 targets
+    sizes = (XOR_INPUTS.shape[1],) + tuple(hidden)
+    layers = [Layer(n, inputs, activation) for inputs, n in zip(sizes, sizes[1:])]
+    layers.append(Layer(XOR_TARGETS.shape[1], sizes[-1], 'sigmoid'))
+    return NeuralNetwork(layers, learning_rate=learning_rate, epochs=epochs, batch_size=batch_size,
+                         optimizer=optimizer, target_error=target_error)
+
+
+def train_seeds(args):
+    # One row per seed: converged, epochs trained, training time, final error.
+    # Layers draw from the global RNG, so each run reseeds it before building its network.
+    config, seeds, epochs, batch_size, target_error = args
+    results = np.empty((len(seeds), 4), dtype=np.float64)
+    for row, seed in zip(results, seeds):
+        np.random.seed(seed)
+        nn = build_network(*config, epochs, batch_size, target_error)
+        start = time.perf_counter()
+        nn.fit(XOR_INPUTS, XOR_TARGETS)
+        elapsed = time.perf_counter() - start
+        # Reaching the threshold is not enough if one of the four points is still misclassified
+        converged = nn.final_error <= target_error and np.array_equal(nn.predict(XOR_INPUTS), XOR_TARGETS)
+        row[:] = converged, nn.epochs_trained, elapsed, nn.final_error
+    return results
+
+
+def run_config(executor, config, seeds, epochs, batch_size, target_error, workers):
+    chunks = np.array_split(seeds, min(len(seeds), workers * 4))
+    jobs = [(config, chunk.tolist(), epochs, batch_size, target_error) for chunk in chunks]
+    start = time.perf_counter()
+    results = np.concatenate(list(executor.map(train_seeds, jobs)))
+    return results, time.perf_counter() - start
+
+
+def summarize(config, results, wall_time):
+    hidden, activation, learning_rate, optimizer = config
+    converged = results[:, 0].astype(bool)
+    runs = len(results)
+    rate = converged.mean()
+    # Wilson score interval for the convergence rate
+    z = 1.96
+    center = (rate + z * z / (2 * runs)) / (1 + z * z / runs)
+    spread = z * np.sqrt(rate * (1 - rate) / runs + z * z / (4 * runs * runs)) / (1 + z * z / runs)
+    epochs = results[converged, 1]
+    return {
+        'hidden': 'x'.join(map(str, hidden)) or '-',
+        'activation': activation,
+        'learning_rate': learning_rate,
+        'optimizer': optimizer,
+        'runs': runs,
+        'rate': rate,
+        'rate_low': max(center - spread, 0.0),
+        'rate_high': min(center + spread, 1.0),
+        'epochs': np.percentile(epochs, PERCENTILES) if epochs.size else np.full(len(PERCENTILES), np.nan),
+        'run_time': results[:, 2].mean(),
+        'time_to_converge': results[converged, 2].mean() if epochs.size else np.nan,
+        'wall_time': wall_time,
+    }
+
+
+def print_report(summaries):
+    header = (f"{'hidden':>8} {'activation':>10} {'lr':>7} {'optimizer':>9} {'runs':>5} {'converged':>9} {'95% CI':>13} "
+              + ' '.join(f"{f'p{p} ep':>8}" for p in PERCENTILES)
+              + f" {'run ms':>8} {'conv ms':>8} {'wall s':>7}")
+    print(header)
+    print('-' * len(header))
+    # Most reliable first, then fastest to converge
+    for s in sorted(summaries, key=lambda s: (-s['rate'], np.nan_to_num(s['epochs'][2], nan=np.inf))):
+        print(f"{s['hidden']:>8} {s['activation']:>10} {s['learning_rate']:>7g} {s['optimizer']:>9} {s['runs']:>5} "
+              f"{s['rate']:>9.1%} {s['rate_low']:>6.1%}-{s['rate_high']:>6.1%} "
+              + ' '.join(f"{e:>8.0f}" for e in s['epochs'])
+              + f" {s['run_time'] * 1e3:>8.1f} {s['time_to_converge'] * 1e3:>8.1f} {s['wall_time']:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train many independently seeded XOR networks per configuration "
+                                                 "and compare how reliably and how fast they converge")
+    parser.add_argument('--hidden', type=int, nargs='+', action='append', metavar='SIZE',
+                        help="Hidden layer sizes, repeat for several architectures (default: --hidden 2)")
+    parser.add_argument('--activation', nargs='+', default=['sigmoid'], help="Hidden layer activations")
+    parser.add_argument('--lr', type=float, nargs='+', default=[0.1], help="Learning rates")
+    parser.add_argument('--optimizer', nargs='+', default=['sgd'], help="sgd, momentum or adam")
+    parser.add_argument('--runs', type=int, default=200, help="Seeds per configuration")
+    parser.add_argument('--epochs', type=int, default=10_000, help="Epoch limit of each run")
+    parser.add_argument('--batch-size', type=int, default=1, help="0 trains on the full dataset at once")
+    parser.add_argument('--target-error', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0, help="Root seed the run seeds are derived from")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help=".npz file for the per-run results")
+    args = parser.parse_args()
+
+    configs = list(itertools.product([tuple(h) for h in args.hidden or [[2]]], args.activation, args.lr,
+                                     args.optimizer))
+    # Independent seeds from one root, the same for every configuration so they start from comparable draws
+    seeds = np.random.SeedSequence(args.seed).generate_state(args.runs)
+    workers = args.workers or os.cpu_count()
+    batch_size = args.batch_size or None
+
+    summaries = []
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for config in configs:
+            config_results, wall_time = run_config(executor, config, seeds, args.epochs, batch_size, args.target_error,
+                                                   workers)
+            summary = summarize(config, config_results, wall_time)
+            summaries.append(summary)
+            results[f"{summary['hidden']}_{config[1]}_{config[2]:g}_{config[3]}"] = config_results
+            print(f"{summary['hidden']} {config[1]} lr={config[2]:g} {config[3]}: {summary['rate']:.1%} converged "
+                  f"in {wall_time:.2f} s")
+    print()
+    print_report(summaries)
+    print(f"\n{len(configs)} configurations x {args.runs} runs on {workers} workers in "
+          f"{time.perf_counter() - start:.2f} s")
+    if args.output:
+        np.savez_compressed(args.output, seeds=seeds, **results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,49 @@
-from neuron import Neuron
+from activations import ACTIVATIONS
 import numpy as np
 
 class Layer:
+    # All neurons of the layer at once: row j of weights and bias[j] are neuron j.
+    # Inputs are a single sample of shape (num_inputs,) or a batch of shape (N, num_inputs).
     def __init__(self, num_neurons, num_inputs, activation_function):
-        self.neurons = [Neuron(num_inputs, activation_function) for _ in range(num_neurons)]
+        self.activation_function, self.activation_derivative = ACTIVATIONS[activation_function]
+        # Drawn neuron by neuron, weights then bias, like the former per-neuron layers,
+        # so a seeded network starts from the same parameters
+        parameters = np.random.uniform(-1, 1, (num_neurons, num_inputs + 1))
+        self.weights = parameters[:, :num_inputs].copy()
+        self.bias = parameters[:, num_inputs].copy()
+        self.inputs = np.zeros(num_inputs)
         self.outputs = np.zeros(num_neurons)
         self.errors = np.zeros(num_neurons)
         self.deltas = np.zeros(num_neurons)
+        self.delta_i = np.zeros_like(self.weights)
 
     def forward(self, inputs):
-        self.outputs = [neuron.forward(inputs) for neuron in self.neurons]
+        # inputs must be a float64 array, NeuralNetwork converts once instead of on every layer call
+        self.inputs = inputs
+        self.outputs = self.activation_function(np.dot(inputs, self.weights.T) + self.bias)
         return self.outputs
 
     def backward(self, errors):
         self.errors = errors
-        self.deltas = [neuron.backward(error) for neuron, error in zip(self.neurons, errors)]
-        return np.sum(self.deltas, axis=0)
-    
+        self.deltas = errors * self.activation_derivative(self.outputs)
+        # delta_i[j] = inputs * deltas[j], averaged over the samples of a batch
+        if self.deltas.ndim > 1:
+            self.delta_i = self.deltas.T @ self.inputs / len(self.inputs)
+        else:
+            self.delta_i = self.deltas[:, None] * self.inputs
+        return self.deltas @ self.weights
+
+    def gradients(self):
+        # Weight and bias gradients of the last backward pass, the bias follows the mean of delta_i
+        return self.delta_i, np.add.reduce(self.delta_i, axis=1) / self.delta_i.shape[1]
+
     def update_weights(self, learning_rate):
-        for neuron in self.neurons:
-            neuron.update_weights(learning_rate)
+        self.weights -= learning_rate * self.delta_i
+        # Mean over each neuron's inputs, written out because np.mean's overhead dominates on layers this small
+        self.bias -= learning_rate * (np.add.reduce(self.delta_i, axis=1) / self.delta_i.shape[1])
 
     def print_configuration(self):
         print(f"Layer configuration:")
-        print(f"Number of neurons: {len(self.neurons)}")
-        for i, neuron in enumerate(self.neurons):
-            print(f"Neuron {i+1}: {neuron}")
-    
\ No newline at end of file
+        print(f"Number of neurons: {len(self.bias)}")
+        for i, (weights, bias) in enumerate(zip(self.weights, self.bias)):
+            print(f"Neuron {i+1}: Neuron: {weights}, {bias}")
@@ -10,12 +10,12 @@ def plot_error_history(error_history):
     plt.ylabel('Error')
     plt.title('Error History')
 
-def plot_decision_boundary(nn: NeuralNetwork, inputs, targets):
+def plot_decision_boundary(nn: NeuralNetwork, inputs, targets, h=0.01):
     x_min, x_max = -0.5, 1.5
     y_min, y_max = -0.5, 1.5
-    h = 0.01
     xx, yy = np.meshgrid(np.arange(x_min, x_max, h), np.arange(y_min, y_max, h))
-    Z = np.array([nn.predict([x, y]) for x, y in zip(xx.ravel(), yy.ravel())])
+    # The whole mesh is evaluated as one (N, 2) batch
+    Z = nn.predict(np.column_stack((xx.ravel(), yy.ravel())))
     Z = Z.reshape(xx.shape)
     
     plt.figure()
@@ -1,45 +1,93 @@
 import numpy as np
 from layer import Layer
+from optimizers import SGD, OPTIMIZERS
 
 class NeuralNetwork:
-    def __init__(self, layers: list[Layer], learning_rate=0.1, epochs=10000, debug=False):
+    def __init__(self, layers: list[Layer], learning_rate=0.1, epochs=10000, debug=False, batch_size=1, shuffle=False,
+                 optimizer=None, target_error=None, callbacks=()):
+        # batch_size=1 is per-sample SGD, None trains on the full dataset at once; larger batches
+        # average the gradient over the batch and update the weights once per batch.
+        # optimizer is an instance from optimizers.py or its name, plain SGD with learning_rate by default.
+        # Training stops once the epoch error reaches target_error, or when a callback returns True;
+        # callbacks are called as callback(network, epoch, error) after every epoch.
         self.layers = layers
         self.learning_rate = learning_rate
         self.epochs = epochs
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        if optimizer is None:
+            optimizer = SGD(learning_rate)
+        elif isinstance(optimizer, str):
+            optimizer = OPTIMIZERS[optimizer](learning_rate)
+        self.optimizer = optimizer
+        self.target_error = target_error
+        self.callbacks = list(callbacks)
+        self.epochs_trained = 0
         self.final_error = 0
         self.error_history = []
         self.debug = debug
 
     def forward(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float64)
         for layer in self.layers:
             inputs = layer.forward(inputs)
         return inputs
 
     def backward(self, target):
-        errors = -np.subtract(target, self.layers[-1].outputs)
+        errors = self.layers[-1].outputs - target
+        step = self.optimizer.step
         for layer in reversed(self.layers):
             errors = layer.backward(errors)
-            layer.update_weights(self.learning_rate)
+            step(layer)
         return errors
 
     def calculate_error(self, targets):
-        return np.sum(np.square(np.subtract(targets, self.layers[-1].outputs)) * 0.5)
+        return np.add.reduce(np.square(np.subtract(targets, self.layers[-1].outputs)) * 0.5, axis=None)
     
     def fit(self, inputs, targets):
+        inputs = np.asarray(inputs, dtype=np.float64)
+        # One row per sample, 1-D labels would broadcast against the (N, 1) outputs to (N, N)
+        targets = np.asarray(targets, dtype=np.float64).reshape(len(inputs), -1)
+        batch_size = self.batch_size or len(inputs)
         for _ in range(self.epochs):
+            if self.shuffle:
+                order = np.random.permutation(len(inputs))
+                epoch_inputs, epoch_targets = inputs[order], targets[order]
+            else:
+                epoch_inputs, epoch_targets = inputs, targets
             self.final_error = 0
-            for i in range(len(inputs)):
-                self.forward(inputs[i].copy())
-                self.backward(targets[i].copy())
-                self.final_error += self.calculate_error(targets[i])
+            if batch_size == 1:
+                output_layer = self.layers[-1]
+                for sample, target in zip(epoch_inputs, epoch_targets):
+                    self.forward(sample)
+                    self.backward(target)
+                    # Same value as calculate_error, taken from the output errors backward already has
+                    errors = output_layer.errors
+                    self.final_error += np.dot(errors, errors) * 0.5
+            else:
+                for start in range(0, len(inputs), batch_size):
+                    batch_targets = epoch_targets[start:start + batch_size]
+                    self.forward(epoch_inputs[start:start + batch_size])
+                    self.backward(batch_targets)
+                    self.final_error += self.calculate_error(batch_targets)
             self.error_history.append(self.final_error)
+            self.epochs_trained = _ + 1
             if self.debug and _ % 1000 == 0:
                 print(f"Epoch: {_}")
                 print(f"Total error: {self.final_error}")
                 print()
+            stop = [callback(self, _, self.final_error) for callback in self.callbacks]
+            if any(stop) or (self.target_error is not None and self.final_error <= self.target_error):
+                break
 
-    def predict(self, inputs):
-        return np.round(self.forward(inputs))
+    def predict(self, inputs, chunk_size=1 << 16):
+        # One sample or an (N, features) array; large arrays go through the layers in chunks
+        # so the activations of a huge mesh never have to be held at once
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.ndim == 1 or len(inputs) <= chunk_size:
+            return np.round(self.forward(inputs))
+        return np.concatenate([np.round(self.forward(inputs[start:start + chunk_size]))
+                               for start in range(0, len(inputs), chunk_size)])
     
     def print_configuration(self):
         print(f"Neural network configuration:")
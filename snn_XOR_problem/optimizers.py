@@ -0,0 +1,62 @@
+import numpy as np
+
+# Optimizers update one layer at a time from the gradients its backward pass left behind.
+# Their state (velocities, moments) is kept in arrays per layer, keyed by the layer itself.
+
+
+class SGD:
+    def __init__(self, learning_rate=0.1):
+        self.learning_rate = learning_rate
+
+    def step(self, layer):
+        layer.update_weights(self.learning_rate)
+
+
+class Momentum:
+    def __init__(self, learning_rate=0.1, momentum=0.9):
+        self.learning_rate = learning_rate
+        self.momentum = momentum
+        self.velocity = {}
+
+    def step(self, layer):
+        if layer not in self.velocity:
+            self.velocity[layer] = (np.zeros_like(layer.weights), np.zeros_like(layer.bias))
+        velocity_w, velocity_b = self.velocity[layer]
+        weights_gradient, bias_gradient = layer.gradients()
+        velocity_w *= self.momentum
+        velocity_w -= self.learning_rate * weights_gradient
+        velocity_b *= self.momentum
+        velocity_b -= self.learning_rate * bias_gradient
+        layer.weights += velocity_w
+        layer.bias += velocity_b
+
+
+class Adam:
+    def __init__(self, learning_rate=0.01, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.moments = {}
+
+    def step(self, layer):
+        if layer not in self.moments:
+            self.moments[layer] = [0, [np.zeros_like(layer.weights), np.zeros_like(layer.weights)],
+                                   [np.zeros_like(layer.bias), np.zeros_like(layer.bias)]]
+        state = self.moments[layer]
+        state[0] += 1
+        t = state[0]
+        correction = self.learning_rate * np.sqrt(1 - self.beta2 ** t) / (1 - self.beta1 ** t)
+        for parameter, gradient, (m, v) in zip((layer.weights, layer.bias), layer.gradients(), state[1:]):
+            m *= self.beta1
+            m += (1 - self.beta1) * gradient
+            v *= self.beta2
+            v += (1 - self.beta2) * gradient ** 2
+            parameter -= correction * m / (np.sqrt(v) + self.epsilon)
+
+
+OPTIMIZERS = {
+    'sgd': SGD,
+    'momentum': Momentum,
+    'adam': Adam,
+}
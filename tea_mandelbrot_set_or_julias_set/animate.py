@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import escape_time
+from render import PngWriter, colorize, colormap_lut
+
+# Buffers of the current worker process, allocated once by init_worker and reused for every frame
+_frame = None
+
+
+class FrameBuffers:
+    def __init__(self, view, width, height, max_iter, cmap):
+        self.grid = escape_time.complex_grid(*view, width, height)
+        self.max_iter = max_iter
+        self.lut = colormap_lut(cmap)
+        self.counts = np.empty((height, width), dtype=np.int32)
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self.work = escape_time.EscapeBuffers(width * height)
+
+    def render(self, c):
+        escape_time.julia(self.grid, c, self.max_iter, out=self.counts, buffers=self.work)
+        # A fixed 0..max_iter scale keeps colors from flickering between frames
+        return colorize(self.counts[::-1], self.lut, 0, self.max_iter, out=self.rgb)
+
+
+def init_worker(view, width, height, max_iter, cmap):
+    global _frame
+    _frame = FrameBuffers(view, width, height, max_iter, cmap)
+
+
+def render_frame_file(index, c, pattern):
+    path = pattern.format(index)
+    with PngWriter(path, _frame.rgb.shape[1], _frame.rgb.shape[0]) as writer:
+        writer.write_rows(_frame.render(c))
+    return path
+
+
+def render_frame_bytes(c):
+    return _frame.render(c).tobytes()
+
+
+def c_path(waypoints, frames, closed=False):
+    # Points evenly spaced by arc length along the polyline through the waypoints
+    points = np.asarray(waypoints, dtype=np.complex128)
+    if closed:
+        points = np.append(points, points[0])
+    if points.size == 1:
+        return np.full(frames, points[0])
+    distance = np.concatenate(([0.0], np.cumsum(np.abs(np.diff(points)))))
+    s = np.linspace(0, distance[-1], frames, endpoint=not closed)
+    return np.interp(s, distance, points.real) + 1j * np.interp(s, distance, points.imag)
+
+
+def c_circle(radius, frames, center=0j):
+    angles = np.linspace(0, 2 * np.pi, frames, endpoint=False)
+    return center + radius * np.exp(1j * angles)
+
+
+def render_frames(cs, view, width, height, max_iter, output=None, raw=None, cmap="twilight_shifted", workers=None,
+                  report_every=25):
+    # Writes one PNG per c value into the output directory, or rgb24 frames in order to the raw stream.
+    # Returns the throughput in frames per second.
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker,
+                             initargs=(view, width, height, max_iter, cmap)) as executor:
+        if raw is None:
+            os.makedirs(output, exist_ok=True)
+            pattern = os.path.join(output, "frame_{:05d}.png")
+            frames = executor.map(render_frame_file, range(len(cs)), cs, [pattern] * len(cs), chunksize=4)
+        else:
+            frames = executor.map(render_frame_bytes, cs, chunksize=4)
+        for done, frame in enumerate(frames, 1):
+            if raw is not None:
+                raw.write(frame)
+            if done % report_every == 0:
+                print(f"{done}/{len(cs)} frames, {done / (time.perf_counter() - start):.1f} fps", file=sys.stderr)
+    return len(cs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render Julia sets along a path of c values as animation frames")
+    parser.add_argument('--path', type=float, nargs='+', metavar='RE IM',
+                        help="waypoints of c as re/im pairs, frames are spaced evenly along the polyline")
+    parser.add_argument('--closed', action='store_true', help="return from the last waypoint to the first")
+    parser.add_argument('--circle', type=float, default=0.7885, metavar='RADIUS',
+                        help="circle of c values around 0 when no --path is given")
+    parser.add_argument('--frames', type=int, default=240)
+    parser.add_argument('--center', type=float, nargs=2, default=[0.0, 0.0], metavar=('RE', 'IM'))
+    parser.add_argument('--zoom', type=float, default=1.5, help="half-width of the view on the real axis")
+    parser.add_argument('--size', type=int, nargs=2, default=[640, 480], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--iter', type=int, default=100)
+    parser.add_argument('--cmap', default="twilight_shifted")
+    parser.add_argument('--workers', type=int, default=None)
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--output', help="directory for a numbered PNG frame sequence")
+    output.add_argument('--raw', help="file for a raw rgb24 video stream, '-' for stdout")
+    args = parser.parse_args()
+
+    if args.path and len(args.path) % 2:
+        parser.error("--path takes pairs of real and imaginary parts")
+    if args.path:
+        cs = c_path(np.array(args.path[0::2]) + 1j * np.array(args.path[1::2]), args.frames, args.closed)
+    else:
+        cs = c_circle(args.circle, args.frames)
+    width, height = args.size
+    zoom_y = args.zoom * height / width
+    view = (args.center[0] - args.zoom, args.center[0] + args.zoom, args.center[1] - zoom_y, args.center[1] + zoom_y)
+
+    if args.raw is None:
+        fps = render_frames(cs, view, width, height, args.iter, output=args.output, cmap=args.cmap,
+                            workers=args.workers)
+    else:
+        with (sys.stdout.buffer if args.raw == '-' else open(args.raw, 'wb')) as raw:
+            fps = render_frames(cs, view, width, height, args.iter, raw=raw, cmap=args.cmap, workers=args.workers)
+        print(f"Raw stream: ffmpeg -f rawvideo -pixel_format rgb24 -video_size {width}x{height} -i {args.raw} ...",
+              file=sys.stderr)
+    print(f"Rendered {len(cs)} frames of {width}x{height} at {fps:.1f} fps", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import numpy as np
+
+ESCAPE_RADIUS = 2.0
+# Below this x*x + y*y the exact |z| cannot exceed the radius
+ESCAPE_RADIUS_SQUARED_LOW = ESCAPE_RADIUS ** 2 * (1 - 1e-12)
+# Escaped points are followed a few more iterations to this radius before smooth values are taken,
+# at radius 2 the fractional count and distance estimate are visibly banded
+SMOOTH_RADIUS = 256.0
+SMOOTH_ITERATIONS = 32
+# Orbits that come back this close to a saved iterate are in an attracting cycle and never escape
+PERIOD_TOLERANCE = 1e-10
+PERIOD_TOLERANCE_SQUARED = PERIOD_TOLERANCE ** 2
+
+
+def complex_grid(xmin, xmax, ymin, ymax, width, height):
+    # Same sampling as the original per-pixel loops: rows go from ymin to ymax
+    r1 = np.linspace(xmin, xmax, width)
+    r2 = np.linspace(ymin, ymax, height)
+    return r1[np.newaxis, :] + 1j * r2[:, np.newaxis]
+
+
+def in_cardioid_or_bulb(c):
+    # Points of the main cardioid and the period-2 bulb never escape
+    x = c.real
+    y2 = c.imag * c.imag
+    q = (x - 0.25) ** 2 + y2
+    return (q * (q + (x - 0.25)) <= 0.25 * y2) | ((x + 1) ** 2 + y2 <= 0.0625)
+
+
+class OrbitPlanes:
+    # Per-pixel float32 outputs filled by the escape-time pass next to the counts:
+    # |z| at escape, the fractional (smooth) iteration count and the exterior distance estimate,
+    # taken once the orbit passes SMOOTH_RADIUS.
+    # Points that never escape get modulus 0, smooth max_iter and distance 0.
+    def __init__(self, shape):
+        self.modulus = np.zeros(shape, dtype=np.float32)
+        self.smooth = np.zeros(shape, dtype=np.float32)
+        self.distance = np.zeros(shape, dtype=np.float32)
+
+    def reset(self, max_iter):
+        self.modulus.fill(0)
+        self.smooth.fill(max_iter)
+        self.distance.fill(0)
+
+    def record(self, positions, n, z, dz, c, step):
+        # z, dz are the iterates of points that just escaped at iteration n
+        m = np.full(z.size, n)
+        for _ in range(SMOOTH_ITERATIONS):
+            inside = np.abs(z) <= SMOOTH_RADIUS
+            if not inside.any():
+                break
+            dz[inside] = 2 * z[inside] * dz[inside] + step
+            z[inside] = z[inside] * z[inside] + (c if np.ndim(c) == 0 else c[inside])
+            m[inside] += 1
+        magnitude = np.abs(z)
+        self.modulus.reshape(-1)[positions] = magnitude
+        self.smooth.reshape(-1)[positions] = m + 1 - np.log2(np.log2(magnitude))
+        self.distance.reshape(-1)[positions] = 2 * magnitude * np.log(magnitude) / np.abs(dz)
+
+
+class EscapeBuffers:
+    # Working arrays of escape_time for up to size points. Callers that iterate grids of the same
+    # size over and over (animation frames) pass one in, so only compaction allocates, and only
+    # arrays for the points that are still active.
+    def __init__(self, size):
+        self.x = np.empty(size)
+        self.y = np.empty(size)
+        self.cr = np.empty(size)
+        self.ci = np.empty(size)
+        self.saved_x = np.empty(size)
+        self.saved_y = np.empty(size)
+        self.xx = np.empty(size)
+        self.yy = np.empty(size)
+        self.xy = np.empty(size)
+        self.dy = np.empty(size)
+        self.escaped = np.empty(size, dtype=bool)
+        self.index = np.arange(size)
+
+
+def escape_time(z, c, max_iter, out=None, planes=None, positions=None, periodicity=True, buffers=None):
+    # c is either a scalar (Julia) or an array shaped like z (Mandelbrot).
+    # Iterates z = z*z + c for all points at once and returns the index of the first
+    # iterate with |z| > 2 (max_iter if none), exactly like the scalar loops.
+    # Escaped points are dropped from the working set, so later iterations only touch
+    # pixels that are still (mostly) active.
+    # planes (OrbitPlanes) collects smooth coloring data in the same pass. positions maps
+    # the points of z to flat positions in out and planes, when only some pixels are iterated.
+    # With periodicity, each orbit is compared against an iterate saved at every power of two
+    # (Brent's cycle detection); points caught in a cycle are interior and stop early with max_iter.
+    # buffers (EscapeBuffers) provides the working arrays instead of allocating them on every call.
+    z = np.asarray(z, dtype=np.complex128)
+    shape = z.shape
+    size = z.size
+    work = EscapeBuffers(size) if buffers is None else buffers
+    # Real and imaginary parts are iterated separately with the operations of Python's complex
+    # multiply (x*x - y*y, x*y + y*x), NumPy's complex multiply rounds differently and would
+    # change counts near the boundary
+    x = work.x[:size]
+    y = work.y[:size]
+    np.copyto(x.reshape(shape), z.real)
+    np.copyto(y.reshape(shape), z.imag)
+    uniform_c = np.ndim(c) == 0
+    if uniform_c:
+        c = complex(c)
+        cr, ci = c.real, c.imag
+    else:
+        c = np.asarray(c, dtype=np.complex128).reshape(-1)
+        cr, ci = work.cr[:size], work.ci[:size]
+        np.copyto(cr, c.real)
+        np.copyto(ci, c.imag)
+    # out lets callers that render many frames of the same size reuse one result buffer
+    result = np.empty(shape, dtype=np.int32) if out is None else out
+    counts = result.reshape(-1)
+    counts.fill(max_iter)
+    index = work.index[:size] if positions is None else np.asarray(positions)
+    if planes is not None:
+        planes.reset(max_iter)
+        # Derivative of z_n with respect to c (Mandelbrot, z_0 = 0) or z_0 (Julia)
+        dz = np.full(x.size, 1 if uniform_c else 0, dtype=np.complex128)
+        step = 0 if uniform_c else 1
+
+    # NaN until the first checkpoint, so nothing matches the starting points themselves
+    saved_x = work.saved_x[:size]
+    saved_y = work.saved_y[:size]
+    saved_x.fill(np.nan)
+    saved_y.fill(np.nan)
+    xx, yy, xy, dy = work.xx[:size], work.yy[:size], work.xy[:size], work.dy[:size]
+    escaped = work.escaped[:size]
+    checkpoint = 1
+    finished = 0
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for n in range(max_iter):
+            np.multiply(x, x, out=xx)
+            np.multiply(y, y, out=yy)
+            # x*x + y*y is within a few ulp of |z|^2, only points near the radius need the exact
+            # abs(z) (hypot) of the scalar loops to decide
+            np.add(xx, yy, out=xy)
+            np.greater(xy, ESCAPE_RADIUS_SQUARED_LOW, out=escaped)
+            if escaped.any():
+                candidates = np.flatnonzero(escaped)
+                candidates = candidates[np.hypot(x[candidates], y[candidates]) > ESCAPE_RADIUS]
+                if candidates.size:
+                    counts[index[candidates]] = n
+                    if planes is not None:
+                        planes.record(index[candidates], n, x[candidates] + 1j * y[candidates], dz[candidates],
+                                      c if uniform_c else c[candidates], step)
+                    # NaN never compares greater than the radius again and stays NaN without warnings,
+                    # so finished points can sit in the working set until compacting pays off
+                    x[candidates] = np.nan
+                    y[candidates] = np.nan
+                    xx[candidates] = np.nan
+                    finished += candidates.size
+                if finished * 4 >= x.size:
+                    active = ~np.isnan(x)
+                    x, y = x[active], y[active]
+                    xx, yy = xx[active], yy[active]
+                    index = index[active]
+                    if not uniform_c:
+                        c, cr, ci = c[active], cr[active], ci[active]
+                    if planes is not None:
+                        dz = dz[active]
+                    saved_x, saved_y = saved_x[active], saved_y[active]
+                    xy, dy, escaped = xy[:x.size], dy[:x.size], escaped[:x.size]
+                    finished = 0
+                    if x.size == 0:
+                        break
+            if periodicity:
+                if n == checkpoint:
+                    saved_x[:] = x
+                    saved_y[:] = y
+                    checkpoint *= 2
+                else:
+                    np.subtract(x, saved_x, out=xy)
+                    np.multiply(xy, xy, out=xy)
+                    np.subtract(y, saved_y, out=dy)
+                    np.multiply(dy, dy, out=dy)
+                    xy += dy
+                    cycle = np.less(xy, PERIOD_TOLERANCE_SQUARED, out=escaped)
+                    if cycle.any():
+                        x[cycle] = np.nan
+                        y[cycle] = np.nan
+                        xx[cycle] = np.nan
+                        finished += np.count_nonzero(cycle)
+            if planes is not None:
+                dz *= 2 * (x + 1j * y)
+                dz += step
+            # x, y = x*x - y*y + cr, x*y + y*x + ci; x*y + y*x is exactly 2 * (x*y)
+            np.multiply(x, y, out=xy)
+            np.subtract(xx, yy, out=x)
+            x += cr
+            np.multiply(xy, 2, out=y)
+            y += ci
+    return result
+
+
+def mandelbrot(c, max_iter, out=None, planes=None, periodicity=True, buffers=None):
+    c = np.asarray(c, dtype=np.complex128)
+    outside = ~in_cardioid_or_bulb(c)
+    result = np.empty(c.shape, dtype=np.int32) if out is None else out
+    escape_time(np.zeros(np.count_nonzero(outside), dtype=np.complex128), c[outside], max_iter, result, planes,
+                np.flatnonzero(outside), periodicity, buffers)
+    return result
+
+
+def julia(z, c, max_iter, out=None, planes=None, periodicity=True, buffers=None):
+    return escape_time(z, complex(c), max_iter, out, planes, periodicity=periodicity, buffers=buffers)
+
+
+def adaptive_max_iter(counts, limit, minimum=64, quantile=0.99, margin=1.5):
+    # Iteration budget from a coarse pass computed with max_iter=limit: enough for all but the
+    # slowest escaping pixels with some headroom. Interior pixels, which reach the limit, do not
+    # raise it, cycle detection lets them stop early at any budget.
+    escaped = counts[counts < limit]
+    if escaped.size == 0:
+        return min(minimum, limit)
+    return int(min(max(np.ceil(np.quantile(escaped, quantile) * margin), minimum), limit))
+
+
+def compute_set(xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c=None, planes=None):
+    grid = complex_grid(xmin, xmax, ymin, ymax, width, height)
+    if set_type == "mandelbrot":
+        return mandelbrot(grid, max_iter, planes=planes)
+    return julia(grid, c, max_iter, planes=planes)
@@ -1,9 +1,20 @@
+import math
 import tkinter as tk
+from decimal import Decimal, InvalidOperation, localcontext
 from tkinter import ttk
 import numpy as np
 import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.colors import Normalize
 from matplotlib.figure import Figure
+import escape_time
+import perturbation
+from tiles import TileRenderer
+
+RENDER_POLL_INTERVAL = 30
+PREVIEW_SCALE = 8
+# Largest budget Auto Iterations may pick, the coarse pass that decides it runs this many iterations
+AUTO_ITER_LIMIT = 20000
 
 class FractalVisualizer:
     def __init__(self, root):
@@ -20,6 +31,9 @@ class FractalVisualizer:
         self.set_type_var = tk.StringVar(value="mandelbrot")
         self.julia_re_var = tk.StringVar(value="-0.7")
         self.julia_im_var = tk.StringVar(value="0.27015")
+        self.deep_zoom_var = tk.BooleanVar(value=False)
+        self.auto_iter_var = tk.BooleanVar(value=False)
+        self.tile_cache_var = tk.BooleanVar(value=True)
 
         self.xmin = -2.0
         self.xmax = 1.0
@@ -27,6 +41,15 @@ class FractalVisualizer:
         self.ymax = 1.0
 
         self.update_job = [None]
+        self.renderer = TileRenderer()
+        self.render_job = None
+        self.img = None
+        self.image_artist = None
+        self.preview_artist = None
+        self.norm = Normalize()
+        self.reference = None
+        self.zoom_x = 1.5
+        self.zoom_y = 1.0
 
         self._create_widgets()
 
@@ -76,7 +99,13 @@ class FractalVisualizer:
         self.julia_im_entry = ttk.Entry(control_frame, textvariable=self.julia_im_var, width=15)
         self.julia_im_entry.grid(row=10, column=1, pady=2)
 
-        ttk.Button(control_frame, text="Draw Fractal", command=self.update_plot).grid(row=11, column=0, columnspan=2, pady=15)
+        ttk.Checkbutton(control_frame, text="Deep Zoom (Mandelbrot)", variable=self.deep_zoom_var, command=self.update_plot).grid(row=11, column=0, columnspan=2, sticky="w", pady=(10, 0))
+
+        ttk.Checkbutton(control_frame, text="Auto Iterations", variable=self.auto_iter_var, command=self.update_plot).grid(row=12, column=0, columnspan=2, sticky="w")
+
+        ttk.Checkbutton(control_frame, text="Tile Cache (snaps to lattice)", variable=self.tile_cache_var, command=self.update_plot).grid(row=13, column=0, columnspan=2, sticky="w")
+
+        ttk.Button(control_frame, text="Draw Fractal", command=self.update_plot).grid(row=14, column=0, columnspan=2, pady=15)
 
         self.canvas_frame = ttk.Frame(self.root, padding="0 0 0 0")
         self.canvas_frame.grid(row=0, column=1, sticky="nsew")
@@ -98,21 +127,75 @@ class FractalVisualizer:
             z = z*z + c
         return max_iter
 
-    def compute_set(self, xmin, xmax, ymin, ymax, width, height, max_iter, set_type):
-        r1 = np.linspace(xmin, xmax, width)
-        r2 = np.linspace(ymin, ymax, height)
+    def julia_c(self):
+        try:
+            return complex(float(self.julia_re_var.get()), float(self.julia_im_var.get()))
+        except ValueError:
+            print("Invalid Julia parameter value. Using default c = -0.7 + 0.27015i")
+            return complex(-0.7, 0.27015)
 
-        if set_type == "mandelbrot":
-            return np.array([[self.mandelbrot(complex(r, i), max_iter) for r in r1] for i in r2])
+    def compute_set(self, xmin, xmax, ymin, ymax, width, height, max_iter, set_type):
+        c_julia = self.julia_c() if set_type == "julia" else None
+        return self.renderer.compute_set(xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c_julia)
+
+    def start_render(self, width, height, max_iter, set_type):
+        # Tiles are rendered on the process pool (or taken from the tile cache) and painted by poll_render as they arrive
+        self.cancel_render()
+        c_julia = self.julia_c() if set_type == "julia" else None
+        if self.reference is not None:
+            self.render_job = self.renderer.render_perturbation(self.reference, self.zoom_x, self.zoom_y,
+                                                                width, height, max_iter)
+        elif self.tile_cache_var.get():
+            self.render_job = self.renderer.render_cached(self.xmin, self.xmax, self.ymin, self.ymax,
+                                                          width, height, max_iter, set_type, c_julia)
         else:
-            try:
-                c_julia = complex(float(self.julia_re_var.get()), float(self.julia_im_var.get()))
-            except ValueError:
-                print("Invalid Julia parameter value. Using default c = -0.7 + 0.27015i")
-                c_julia = complex(-0.7, 0.27015)
-
-            return np.array([[self.julia(complex(r, i), c_julia, max_iter) for r in r1] for i in r2])
+            # Exact pixel positions, nothing is cached
+            self.render_job = self.renderer.render(self.xmin, self.xmax, self.ymin, self.ymax,
+                                                   width, height, max_iter, set_type, c_julia)
+        self.img = np.zeros((height, width), dtype=np.int32)
+        self.root.after(RENDER_POLL_INTERVAL, self.poll_render, self.render_job)
+
+    def cancel_render(self):
+        if self.render_job is not None:
+            self.render_job.cancel()
+            self.render_job = None
+
+    def poll_render(self, job):
+        if job is not self.render_job:
+            return
 
+        tiles = job.completed_tiles()
+        for row0, row1, col0, col1 in tiles:
+            self.img[row0:row1, col0:col1] = job.image[row0:row1, col0:col1]
+        if job.done:
+            job.close()
+            self.render_job = None
+            # Final colours are scaled to the full-resolution image only, the preview is no longer visible
+            # A job served entirely from the cache finishes on its first poll, before any partial paint
+            self.preview_artist.set_visible(False)
+            self.image_artist.set_visible(True)
+            self.image_artist.set_data(self.img)
+            self.norm.vmin, self.norm.vmax = self.img.min(), self.img.max()
+            self.canvas.draw_idle()
+        elif tiles:
+            self.image_artist.set_visible(True)
+            self.image_artist.set_data(np.ma.masked_array(self.img, mask=~job.filled))
+            self.norm.vmin = min(self.norm.vmin, self.img[job.filled].min())
+            self.norm.vmax = max(self.norm.vmax, self.img[job.filled].max())
+            self.canvas.draw_idle()
+
+        if self.render_job is not None:
+            self.root.after(RENDER_POLL_INTERVAL, self.poll_render, job)
+
+    def compute_preview(self, width, height, max_iter, set_type):
+        # Coarse pass computed right away in this process while the pool refines the full image
+        preview_width, preview_height = max(width // PREVIEW_SCALE, 1), max(height // PREVIEW_SCALE, 1)
+        if self.reference is not None:
+            offsets = perturbation.pixel_offsets(self.zoom_x, self.zoom_y, preview_width, preview_height)
+            return perturbation.perturbation_counts(offsets, self.reference, max_iter)
+        c_julia = self.julia_c() if set_type == "julia" else None
+        return escape_time.compute_set(self.xmin, self.xmax, self.ymin, self.ymax,
+                                       preview_width, preview_height, max_iter, set_type, c_julia)
 
     def update_plot(self):
         try:
@@ -138,8 +221,35 @@ class FractalVisualizer:
         self.xmax = center_re + zoom_x
         self.ymin = center_im - zoom_y
         self.ymax = center_im + zoom_y
-
-        img = self.compute_set(self.xmin, self.xmax, self.ymin, self.ymax, width, height, max_iter, self.set_type_var.get())
+        self.zoom_x = zoom_x
+        self.zoom_y = zoom_y
+
+        auto_iter = self.auto_iter_var.get()
+        if auto_iter:
+            max_iter = AUTO_ITER_LIMIT
+
+        deep_zoom = self.deep_zoom_var.get() and self.set_type_var.get() == "mandelbrot"
+        if deep_zoom:
+            # The centre strings keep every digit, the reference orbit is iterated at the precision the zoom needs
+            digits = perturbation.precision_for(min(zoom_x, zoom_y))
+            self.reference = perturbation.reference_orbit(self.center_re_var.get(), self.center_im_var.get(), max_iter, digits)
+        else:
+            self.reference = None
+
+        if auto_iter:
+            # The coarse pass runs to the limit and its escape distribution picks the budget; clipping
+            # its counts gives exactly the preview that budget would have produced
+            preview = self.compute_preview(width, height, max_iter, self.set_type_var.get())
+            max_iter = escape_time.adaptive_max_iter(preview, max_iter)
+            np.minimum(preview, max_iter, out=preview)
+            if self.reference is not None:
+                self.reference = self.reference[:max_iter + 1]
+            self.start_render(width, height, max_iter, self.set_type_var.get())
+        else:
+            # Starting a new render cancels the refinement of the previous view
+            self.start_render(width, height, max_iter, self.set_type_var.get())
+            preview = self.compute_preview(width, height, max_iter, self.set_type_var.get())
+        self.norm = Normalize(preview.min(), preview.max())
 
         self.fig.clf()
 
@@ -149,12 +259,20 @@ class FractalVisualizer:
 
         title = "Mandelbrot Set" if self.set_type_var.get() == "mandelbrot" else f"Julia Set (c = {self.julia_re_var.get()} + {self.julia_im_var.get()}i)"
 
-        ax.imshow(img, extent=(self.xmin, self.xmax, self.ymin, self.ymax), cmap="twilight_shifted", origin='lower', aspect='auto')
+        # Deep views are placed relative to the centre, absolute doubles cannot tell their edges apart
+        extent = (-zoom_x, zoom_x, -zoom_y, zoom_y) if deep_zoom else (self.xmin, self.xmax, self.ymin, self.ymax)
+        self.preview_artist = ax.imshow(preview, extent=extent, cmap="twilight_shifted", norm=self.norm, origin='lower', aspect='auto', interpolation='nearest')
+        self.image_artist = ax.imshow(np.ma.masked_all((1, 1)), extent=extent, cmap="twilight_shifted", norm=self.norm, origin='lower', aspect='auto', visible=False)
 
         ax.text(0.5, 0.95, title, transform=ax.transAxes, ha='center', color='white', fontsize=10)
+        if auto_iter:
+            ax.text(0.5, 0.91, f"{max_iter} iterations (auto)", transform=ax.transAxes, ha='center', color='white', fontsize=7)
 
-        ax.text(0.02, 0.02, f"Re: [{self.xmin:.4f}, {self.xmax:.4f}]", transform=ax.transAxes, ha='left', va='bottom', color='white', fontsize=7)
-        ax.text(0.98, 0.02, f"Im: [{self.ymin:.4f}, {self.ymax:.4f}]", transform=ax.transAxes, ha='right', va='bottom', color='white', fontsize=7)
+        if deep_zoom:
+            ax.text(0.02, 0.02, f"Zoom: {zoom_x:.3e} (perturbation, {len(self.reference) - 1} reference iterations)", transform=ax.transAxes, ha='left', va='bottom', color='white', fontsize=7)
+        else:
+            ax.text(0.02, 0.02, f"Re: [{self.xmin:.4f}, {self.xmax:.4f}]", transform=ax.transAxes, ha='left', va='bottom', color='white', fontsize=7)
+            ax.text(0.98, 0.02, f"Im: [{self.ymin:.4f}, {self.ymax:.4f}]", transform=ax.transAxes, ha='right', va='bottom', color='white', fontsize=7)
 
         self.canvas.draw()
 
@@ -175,22 +293,31 @@ class FractalVisualizer:
         click_x_norm = event.x / width
         click_y_norm = 1 - (event.y / height)
 
-        new_re = self.xmin + click_x_norm * (self.xmax - self.xmin)
-        new_im = self.ymin + click_y_norm * (self.ymax - self.ymin)
-
-        self.center_re_var.set(f"{new_re:.6f}")
-        self.center_im_var.set(f"{new_im:.6f}")
-
         try:
+            center_re = Decimal(self.center_re_var.get())
+            center_im = Decimal(self.center_im_var.get())
             current_zoom = float(self.zoom_var.get())
-            self.zoom_var.set(f"{current_zoom * 0.5}")
-        except ValueError:
+            decimals = max(6, math.ceil(-math.log10(current_zoom)) + 6)
+        except (InvalidOperation, ValueError):
              print("Invalid zoom value. Cannot zoom.")
              return
 
+        # The click is applied as an offset from the centre, so deep zooms keep all their digits
+        zoom_y = current_zoom * height / width
+        with localcontext() as context:
+            context.prec = perturbation.precision_for(min(current_zoom, zoom_y)) + 10
+            new_re = center_re + Decimal((click_x_norm - 0.5) * 2 * current_zoom)
+            new_im = center_im + Decimal((click_y_norm - 0.5) * 2 * zoom_y)
+
+        self.center_re_var.set(f"{new_re:.{decimals}f}")
+        self.center_im_var.set(f"{new_im:.{decimals}f}")
+        self.zoom_var.set(f"{current_zoom * 0.5}")
+
         self.update_plot()
 
     def on_exit(self):
+        self.cancel_render()
+        self.renderer.shutdown()
         self.root.quit()
         self.root.destroy()
 
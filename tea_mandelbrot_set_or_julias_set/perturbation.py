@@ -0,0 +1,73 @@
+import math
+from decimal import Decimal, localcontext
+
+import numpy as np
+
+ESCAPE_RADIUS = 2.0
+# Decimal digits kept beyond what the zoom level itself needs
+GUARD_DIGITS = 20
+
+
+def precision_for(zoom):
+    return max(int(-math.log10(zoom)), 0) + GUARD_DIGITS
+
+
+def reference_orbit(center_re, center_im, max_iter, digits):
+    # Z_0 .. Z_n of the view centre in arbitrary precision, rounded to doubles.
+    # The orbit stops once it escapes, the perturbation loop rebases past its end.
+    orbit = np.zeros(max_iter + 1, dtype=np.complex128)
+    with localcontext() as context:
+        context.prec = digits
+        cr, ci = Decimal(center_re), Decimal(center_im)
+        zr, zi = Decimal(0), Decimal(0)
+        for n in range(1, max_iter + 1):
+            zr, zi = zr * zr - zi * zi + cr, 2 * zr * zi + ci
+            orbit[n] = complex(float(zr), float(zi))
+            if abs(orbit[n]) > ESCAPE_RADIUS:
+                return orbit[:n + 1]
+    return orbit
+
+
+def pixel_offsets(zoom_x, zoom_y, width, height, rows=slice(None), cols=slice(None)):
+    # Offsets from the view centre, sampled like np.linspace(center - zoom, center + zoom)
+    dx = np.linspace(-zoom_x, zoom_x, width)[cols]
+    dy = np.linspace(-zoom_y, zoom_y, height)[rows]
+    return dx[np.newaxis, :] + 1j * dy[:, np.newaxis]
+
+
+def perturbation_counts(dc, reference, max_iter):
+    # Iterates delta_{n+1} = 2 Z_m delta_n + delta_n^2 + dc in doubles, so z_n = Z_m + delta_n.
+    # When |z_n| drops below |delta_n| the reference is losing precision (a glitch), and when
+    # the reference orbit ends it can no longer be followed; in both cases the pixel is rebased
+    # onto the start of the reference orbit (Z_0 = 0, delta = z_n).
+    dc = np.asarray(dc, dtype=np.complex128)
+    shape = dc.shape
+    dc = dc.reshape(-1)
+    counts = np.full(dc.size, max_iter, dtype=np.int32)
+    delta = np.zeros(dc.size, dtype=np.complex128)
+    m = np.zeros(dc.size, dtype=np.intp)
+    index = np.arange(dc.size)
+    last = reference.size - 1
+
+    for n in range(max_iter):
+        z = reference[m] + delta
+        magnitude = np.abs(z)
+        escaped = magnitude > ESCAPE_RADIUS
+        if escaped.any():
+            counts[index[escaped]] = n
+            active = ~escaped
+            z, magnitude, delta, m, dc, index = (z[active], magnitude[active], delta[active],
+                                                 m[active], dc[active], index[active])
+            if index.size == 0:
+                break
+        rebase = (magnitude < np.abs(delta)) | (m == last)
+        delta[rebase] = z[rebase]
+        m[rebase] = 0
+        delta = 2 * reference[m] * delta + delta * delta + dc
+        m += 1
+    return counts.reshape(shape)
+
+
+def compute_deep(center_re, center_im, zoom_x, zoom_y, width, height, max_iter):
+    reference = reference_orbit(center_re, center_im, max_iter, precision_for(min(zoom_x, zoom_y)))
+    return perturbation_counts(pixel_offsets(zoom_x, zoom_y, width, height), reference, max_iter)
@@ -0,0 +1,173 @@
+import argparse
+import struct
+import time
+import zlib
+from decimal import Decimal
+
+import matplotlib
+import numpy as np
+
+import escape_time
+import perturbation
+from tiles import TileRenderer
+
+# Rows rendered and written per step; memory use depends on this and the width, not the height
+BAND_HEIGHT = 256
+# Width of the coarse pass that fixes the color scale before the first band is written
+PREVIEW_WIDTH = 512
+# Below this half-width doubles run out of precision and the perturbation path is used
+DEEP_ZOOM = 1e-12
+
+
+class PngWriter:
+    # Streams an 8-bit RGB PNG to disk one block of rows at a time
+    def __init__(self, path, width, height, level=6):
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.compressor = zlib.compressobj(level)
+        self.file = open(path, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, rgb):
+        if rgb.shape[1:] != (self.width, 3):
+            raise ValueError(f"Expected rows of shape (n, {self.width}, 3), got {rgb.shape}")
+        # Every scanline starts with its filter type, 0 = none
+        scanlines = np.zeros((rgb.shape[0], self.width * 3 + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rgb.reshape(rgb.shape[0], -1)
+        data = self.compressor.compress(scanlines.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+        self.rows += rgb.shape[0]
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.rows != self.height:
+            raise ValueError(f"Wrote {self.rows} of {self.height} rows")
+        self._chunk(b'IDAT', self.compressor.flush())
+        self._chunk(b'IEND', b'')
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self.file.close()
+            self.file = None
+        self.close()
+
+
+def colormap_lut(name):
+    # The colormap's own table, converted to bytes the way matplotlib does when it draws an image
+    cmap = matplotlib.colormaps[name]
+    return cmap(np.arange(cmap.N), bytes=True)[:, :3]
+
+
+def colorize(counts, lut, vmin, vmax, out=None):
+    # Same colour as the colormap under Normalize(vmin, vmax): floor(x * N), with x = 1 in the last entry
+    n = lut.shape[0]
+    scaled = (counts - vmin) / max(vmax - vmin, 1) * n
+    return np.take(lut, np.clip(scaled, 0, n - 1).astype(np.intp), axis=0, out=out)
+
+
+class FractalView:
+    # A view given by its centre and half-width, like the GUI; the centre is kept as a string
+    # so deep zooms can be iterated in arbitrary precision
+    def __init__(self, center_re, center_im, zoom, width, height, max_iter, set_type="mandelbrot", c=None):
+        self.center_re = str(center_re)
+        self.center_im = str(center_im)
+        self.zoom_x = zoom
+        self.zoom_y = zoom * height / width
+        self.width = width
+        self.height = height
+        self.max_iter = max_iter
+        self.set_type = set_type
+        self.c = c
+        self.deep = set_type == "mandelbrot" and zoom < DEEP_ZOOM
+        self.reference = None
+        if self.deep:
+            digits = perturbation.precision_for(min(self.zoom_x, self.zoom_y))
+            self.reference = perturbation.reference_orbit(self.center_re, self.center_im, max_iter, digits)
+
+    @property
+    def bounds(self):
+        re, im = float(Decimal(self.center_re)), float(Decimal(self.center_im))
+        return re - self.zoom_x, re + self.zoom_x, im - self.zoom_y, im + self.zoom_y
+
+    def preview(self, width):
+        height = max(round(width * self.height / self.width), 1)
+        if self.deep:
+            offsets = perturbation.pixel_offsets(self.zoom_x, self.zoom_y, width, height)
+            return perturbation.perturbation_counts(offsets, self.reference, self.max_iter)
+        return escape_time.compute_set(*self.bounds, width, height, self.max_iter, self.set_type, self.c)
+
+    def render_rows(self, renderer, row0, row1):
+        if self.deep:
+            return renderer.render_perturbation(self.reference, self.zoom_x, self.zoom_y, self.width, self.height,
+                                                self.max_iter, rows=(row0, row1))
+        return renderer.render(*self.bounds, self.width, self.height, self.max_iter, self.set_type, self.c,
+                               rows=(row0, row1))
+
+
+def render_image(path, view, cmap="twilight_shifted", renderer=None, band_height=BAND_HEIGHT, vmin=None, vmax=None):
+    # Writes the view as a PNG with the row at ymax on top, matching imshow(origin='lower').
+    # Only two bands are held at a time, one being written while the next renders.
+    owns_renderer = renderer is None
+    renderer = renderer or TileRenderer()
+    lut = colormap_lut(cmap)
+    if vmin is None or vmax is None:
+        # The GUI scales colors to the image range, a coarse pass estimates it up front
+        preview = view.preview(min(PREVIEW_WIDTH, view.width))
+        vmin = int(preview.min()) if vmin is None else vmin
+        vmax = int(preview.max()) if vmax is None else vmax
+
+    # Bands from the top of the image, in row indices counted from ymin
+    bands = [(max(top - band_height, 0), top) for top in range(view.height, 0, -band_height)]
+    try:
+        with PngWriter(path, view.width, view.height) as writer:
+            job = view.render_rows(renderer, *bands[0])
+            for index in range(len(bands)):
+                counts = job.result()
+                job = view.render_rows(renderer, *bands[index + 1]) if index + 1 < len(bands) else None
+                writer.write_rows(colorize(counts[::-1], lut, vmin, vmax))
+    finally:
+        if owns_renderer:
+            renderer.shutdown()
+    return vmin, vmax
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a Mandelbrot or Julia set to a PNG without the GUI")
+    parser.add_argument('output')
+    parser.add_argument('--center', nargs=2, default=["-0.5", "0"], metavar=('RE', 'IM'))
+    parser.add_argument('--zoom', type=float, default=1.5, help="half-width of the view on the real axis")
+    parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--iter', type=int, default=100)
+    parser.add_argument('--set', choices=["mandelbrot", "julia"], default="mandelbrot")
+    parser.add_argument('--julia', type=float, nargs=2, default=[-0.7, 0.27015], metavar=('RE', 'IM'))
+    parser.add_argument('--cmap', default="twilight_shifted")
+    parser.add_argument('--band-height', type=int, default=BAND_HEIGHT)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    width, height = args.size
+    c = complex(*args.julia) if args.set == "julia" else None
+    view = FractalView(args.center[0], args.center[1], args.zoom, width, height, args.iter, args.set, c)
+    renderer = TileRenderer(args.workers)
+    start = time.perf_counter()
+    render_image(args.output, view, args.cmap, renderer, args.band_height)
+    renderer.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {width}x{height} in {elapsed:.2f} s ({width * height / elapsed / 1e6:.1f} Mpixel/s) "
+          f"to '{args.output}'" + (" using perturbation" if view.deep else ""))
+
+if __name__ == "__main__":
+    main()
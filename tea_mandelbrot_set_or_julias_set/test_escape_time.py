@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import escape_time
+
+
+def scalar_escape(z, c, max_iter):
+    # The original per-pixel loop of FractalVisualizer.mandelbrot / julia
+    for n in range(max_iter):
+        if abs(z) > 2:
+            return n
+        z = z*z + c
+    return max_iter
+
+
+@pytest.mark.parametrize("periodicity", [False, True])
+def test_mandelbrot_matches_scalar_loop(periodicity):
+    # Seahorse valley, many pixels escape only after hundreds of iterations
+    grid = escape_time.complex_grid(-0.75, -0.74, 0.10, 0.11, 60, 40)
+    expected = np.array([[scalar_escape(0, complex(c), 2000) for c in row] for row in grid])
+    np.testing.assert_array_equal(escape_time.mandelbrot(grid, 2000, periodicity=periodicity), expected)
+
+
+@pytest.mark.parametrize("periodicity", [False, True])
+def test_julia_matches_scalar_loop(periodicity):
+    c = complex(-0.8, 0.156)
+    grid = escape_time.complex_grid(-1.5, 1.5, -1.0, 1.0, 80, 60)
+    expected = np.array([[scalar_escape(complex(z), c, 1000) for z in row] for row in grid])
+    np.testing.assert_array_equal(escape_time.julia(grid, c, 1000, periodicity=periodicity), expected)
+
+
+def test_planes_do_not_change_counts():
+    grid = escape_time.complex_grid(-0.75, -0.74, 0.10, 0.11, 60, 40)
+    planes = escape_time.OrbitPlanes(grid.shape)
+    np.testing.assert_array_equal(escape_time.mandelbrot(grid, 2000, planes=planes),
+                                  escape_time.mandelbrot(grid, 2000))
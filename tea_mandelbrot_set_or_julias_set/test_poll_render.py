@@ -0,0 +1,130 @@
+import os
+import sys
+from concurrent.futures import wait
+
+import numpy as np
+import pytest
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import escape_time
+import main
+from tiles import SharedBufferJob, TileRenderer
+
+WIDTH, HEIGHT, MAX_ITER = 160, 120, 50
+
+
+class Var:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class Root:
+    # Collects the poll callbacks instead of running a Tk event loop
+    def __init__(self):
+        self.queue = []
+
+    def after(self, delay, function, *args):
+        self.queue.append((function, args))
+
+
+class LateFuture:
+    # Reports done from its second check on, as if it finished while the first check was running
+    def __init__(self):
+        self.checks = 0
+
+    def done(self):
+        self.checks += 1
+        return self.checks > 1
+
+
+class Canvas:
+    def draw_idle(self):
+        pass
+
+
+@pytest.fixture
+def visualizer():
+    # Only the state poll_render and start_render touch, with real matplotlib artists and no Tk window
+    vis = main.FractalVisualizer.__new__(main.FractalVisualizer)
+    vis.root = Root()
+    vis.canvas = Canvas()
+    vis.renderer = TileRenderer(workers=2)
+    vis.render_job = None
+    vis.reference = None
+    vis.julia_re_var = Var("-0.7")
+    vis.julia_im_var = Var("0.27015")
+    vis.xmin, vis.xmax, vis.ymin, vis.ymax = -2.0, 1.0, -1.0, 1.0
+    yield vis
+    vis.cancel_render()
+    vis.renderer.shutdown()
+
+
+def start(vis, set_type, cached):
+    # Same artist setup as update_plot: the preview is shown until the full image replaces it
+    vis.tile_cache_var = Var(cached)
+    vis.start_render(WIDTH, HEIGHT, MAX_ITER, set_type)
+    ax = Figure().add_subplot(111)
+    vis.norm = Normalize(0, MAX_ITER)
+    vis.preview_artist = ax.imshow(np.zeros((2, 2)), norm=vis.norm)
+    vis.image_artist = ax.imshow(np.ma.masked_all((1, 1)), norm=vis.norm, visible=False)
+
+
+def poll(vis):
+    polls = 0
+    while vis.root.queue:
+        function, args = vis.root.queue.pop(0)
+        function(*args)
+        polls += 1
+    return polls
+
+
+def test_render_finished_before_first_poll_is_shown(visualizer):
+    start(visualizer, "mandelbrot", cached=False)
+    wait(visualizer.render_job.futures)
+    assert poll(visualizer) == 1
+    assert visualizer.image_artist.get_visible()
+    assert not visualizer.preview_artist.get_visible()
+    exact = escape_time.compute_set(-2.0, 1.0, -1.0, 1.0, WIDTH, HEIGHT, MAX_ITER, "mandelbrot")
+    np.testing.assert_array_equal(visualizer.image_artist.get_array(), exact)
+
+
+
+def test_future_finishing_during_scan_is_kept():
+    job = SharedBufferJob((1, 1, 1))
+    future = LateFuture()
+    job._pending = [future]
+    try:
+        assert job.finished_futures() == []
+        assert job.finished_futures() == [future]
+        assert job.done
+    finally:
+        job.close()
+
+
+def test_busy_polling_paints_every_tile(visualizer):
+    # Tiles finish while poll_render scans them, none may be dropped
+    exact = escape_time.compute_set(-2.0, 1.0, -1.0, 1.0, WIDTH, HEIGHT, MAX_ITER, "mandelbrot")
+    for _ in range(5):
+        start(visualizer, "mandelbrot", cached=False)
+        poll(visualizer)
+        np.testing.assert_array_equal(visualizer.img, exact)
+
+
+def test_revisited_cached_view_is_shown(visualizer):
+    # Mandelbrot -> Julia -> Mandelbrot: the last render is served entirely from the tile cache
+    start(visualizer, "mandelbrot", cached=True)
+    poll(visualizer)
+    first = visualizer.img.copy()
+    start(visualizer, "julia", cached=True)
+    poll(visualizer)
+    start(visualizer, "mandelbrot", cached=True)
+    assert poll(visualizer) == 1
+    assert visualizer.image_artist.get_visible()
+    assert not visualizer.preview_artist.get_visible()
+    np.testing.assert_array_equal(visualizer.image_artist.get_array(), first)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import matplotlib
+import numpy as np
+import pytest
+from matplotlib.colors import Normalize
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from render import colorize, colormap_lut
+
+
+@pytest.mark.parametrize("name", ["twilight_shifted", "viridis"])
+@pytest.mark.parametrize("vmin, vmax", [(0, 50), (0, 1000), (3, 77)])
+def test_colorize_matches_matplotlib(name, vmin, vmax):
+    # Every level, plus values outside the range, gets the colour imshow would draw
+    counts = np.arange(vmin - 2, vmax + 3, dtype=np.int32)
+    expected = matplotlib.colormaps[name](Normalize(vmin, vmax)(counts), bytes=True)[:, :3]
+    np.testing.assert_array_equal(colorize(counts, colormap_lut(name), vmin, vmax), expected)
@@ -0,0 +1,340 @@
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import escape_time
+import perturbation
+
+TILE_SIZE = 128
+BAND_ROWS = 16
+RESULT_DTYPE = np.int32
+
+# Cached tiles live on a global lattice: level L samples the plane every BASE_SPACING / 2**L
+BASE_SPACING = 1 / 64
+CACHE_LIMIT = 256 * 2**20
+UNKNOWN = -1
+
+
+def split_tiles(width, height, tile_size=TILE_SIZE):
+    tiles = [(row, min(row + tile_size, height), col, min(col + tile_size, width))
+             for row in range(0, height, tile_size)
+             for col in range(0, width, tile_size)]
+    # Tiles closest to the middle of the view are delivered first
+    return sorted(tiles, key=lambda t: abs(t[0] + t[1] - height) + abs(t[2] + t[3] - width))
+
+
+def job_buffers(block, shape):
+    # The iteration counts are followed by a single cancellation flag byte
+    size = math.prod(shape) * np.dtype(RESULT_DTYPE).itemsize
+    out = np.ndarray(shape, dtype=RESULT_DTYPE, buffer=block.buf)
+    cancelled = np.ndarray((1,), dtype=np.uint8, buffer=block.buf, offset=size)
+    return out, cancelled
+
+
+def run_attached(name, shape, function, *args):
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        # The render was cancelled and its buffer released before this tile started
+        return False
+    try:
+        return function(*job_buffers(block, shape), *args)
+    finally:
+        block.close()
+
+
+def escape_counts(points, max_iter, set_type, c):
+    if set_type == "mandelbrot":
+        return escape_time.mandelbrot(points, max_iter)
+    return escape_time.julia(points, c, max_iter)
+
+
+def render_bands(out, cancelled, tile, view, max_iter, set_type, c, full_height=None, row_offset=0):
+    xmin, xmax, ymin, ymax = view
+    height, width = out.shape
+    row0, row1, col0, col1 = tile
+    # Slice the full-view sampling so tiles line up exactly with a single-pass render;
+    # a job may cover only the rows [row_offset, row_offset + height) of a taller view
+    re = np.linspace(xmin, xmax, width)[col0:col1]
+    im = np.linspace(ymin, ymax, full_height or height)[row_offset + row0:row_offset + row1]
+    # Work in bands so a cancelled render frees the worker quickly
+    for band in range(row0, row1, BAND_ROWS):
+        if cancelled[0]:
+            return False
+        band_end = min(band + BAND_ROWS, row1)
+        grid = re[np.newaxis, :] + 1j * im[band - row0:band_end - row0, np.newaxis]
+        out[band:band_end, col0:col1] = escape_counts(grid, max_iter, set_type, c)
+    return True
+
+
+def render_perturbation_bands(out, cancelled, tile, reference, zoom_x, zoom_y, max_iter, full_height=None,
+                              row_offset=0):
+    height, width = out.shape
+    row0, row1, col0, col1 = tile
+    for band in range(row0, row1, BAND_ROWS):
+        if cancelled[0]:
+            return False
+        band_end = min(band + BAND_ROWS, row1)
+        rows = slice(row_offset + band, row_offset + band_end)
+        dc = perturbation.pixel_offsets(zoom_x, zoom_y, width, full_height or height, rows, slice(col0, col1))
+        out[band:band_end, col0:col1] = perturbation.perturbation_counts(dc, reference, max_iter)
+    return True
+
+
+def render_tile(name, shape, tile, bands, args):
+    # bands(out, cancelled, tile, *args) fills the tile and returns False when cancelled
+    return tile if run_attached(name, shape, bands, tile, *args) else None
+
+
+def lattice_spacing(level):
+    return BASE_SPACING * 2.0 ** -level
+
+
+def render_lattice_points(slots, cancelled, slot, level, tx, ty, max_iter, set_type, c):
+    tile = slots[slot].reshape(-1)
+    size = slots.shape[1]
+    spacing = lattice_spacing(level)
+    re = (tx * size + np.arange(size)) * spacing
+    im = (ty * size + np.arange(size)) * spacing
+    # Only points that were not seeded from the parent tile are computed
+    todo = np.flatnonzero(tile == UNKNOWN)
+    rows, cols = np.divmod(todo, size)
+    for start in range(0, todo.size, BAND_ROWS * size):
+        if cancelled[0]:
+            return False
+        part = slice(start, start + BAND_ROWS * size)
+        tile[todo[part]] = escape_counts(re[cols[part]] + 1j * im[rows[part]], max_iter, set_type, c)
+    return True
+
+
+def render_lattice_tile(name, shape, slot, level, tx, ty, max_iter, set_type, c=None):
+    return run_attached(name, shape, render_lattice_points, slot, level, tx, ty, max_iter, set_type, c)
+
+
+class TileCache:
+    def __init__(self, limit=CACHE_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        if key in self.tiles:
+            self.size -= self.tiles.pop(key).nbytes
+        self.tiles[key] = tile
+        self.size += tile.nbytes
+        # Least recently used tiles go first once the memory cap is exceeded
+        while self.size > self.limit and self.tiles:
+            _, evicted = self.tiles.popitem(last=False)
+            self.size -= evicted.nbytes
+
+    def __len__(self):
+        return len(self.tiles)
+
+
+class SharedBufferJob:
+    def __init__(self, shape):
+        size = math.prod(shape) * np.dtype(RESULT_DTYPE).itemsize
+        self.block = shared_memory.SharedMemory(create=True, size=size + 1)
+        self.buffer, self._cancelled = job_buffers(self.block, shape)
+        self._cancelled[0] = 0
+        self.cancelled = False
+        self.futures = []
+        self._pending = []
+
+    @property
+    def done(self):
+        return not self._pending
+
+    def finished_futures(self):
+        # One done() check per future, a future finishing between two checks would be in neither list
+        finished, pending = [], []
+        for future in self._pending:
+            (finished if future.done() else pending).append(future)
+        self._pending = pending
+        return finished
+
+    def cancel(self):
+        self.cancelled = True
+        if self.block is not None:
+            # Tiles already running stop at their next band
+            self._cancelled[0] = 1
+        for future in self._pending:
+            future.cancel()
+        self.close()
+
+    def close(self):
+        if self.block is None:
+            return
+        self.buffer = None
+        self._cancelled = None
+        self.block.close()
+        # Tiles still running keep their own mapping, unlinking only removes the name
+        self.block.unlink()
+        self.block = None
+
+
+class RenderJob(SharedBufferJob):
+    def __init__(self, executor, width, height, bands, args, tile_size=TILE_SIZE):
+        super().__init__((height, width))
+        self.shape = (height, width)
+        self.image = self.buffer
+        self.filled = np.zeros(self.shape, dtype=bool)
+        self.futures = [executor.submit(render_tile, self.block.name, self.shape, tile, bands, args)
+                        for tile in split_tiles(width, height, tile_size)]
+        self._pending = list(self.futures)
+
+    def completed_tiles(self):
+        # Tiles finished since the previous call; their pixels are final in self.image
+        tiles = []
+        for future in self.finished_futures():
+            tile = None if future.cancelled() else future.result()
+            if tile is None:
+                continue
+            row0, row1, col0, col1 = tile
+            self.filled[row0:row1, col0:col1] = True
+            tiles.append(tile)
+        return tiles
+
+    def result(self):
+        wait(self.futures)
+        self.completed_tiles()
+        image = self.image.copy()
+        self.close()
+        return image
+
+    def close(self):
+        self.image = None
+        super().close()
+
+
+class CachedRenderJob(SharedBufferJob):
+    def __init__(self, executor, cache, view, width, height, max_iter, set_type, c=None, tile_size=TILE_SIZE):
+        xmin, xmax, ymin, ymax = view
+        self.shape = (height, width)
+        self.view = view
+        self.cache = cache
+        self.tile_size = tile_size
+        self.key = (set_type, c, max_iter)
+
+        # Screen pixels snap to the nearest point of the coarsest lattice level that is at least as
+        # fine as the pixels, so no two pixels share a sample. The snap moves a pixel by up to half
+        # a lattice step, render() samples the exact pixel positions instead.
+        pixel = (xmax - xmin) / max(width - 1, 1)
+        self.level = math.ceil(math.log2(BASE_SPACING / pixel)) if pixel > 0 else 0
+        spacing = lattice_spacing(self.level)
+        self.cols = np.rint(np.linspace(xmin, xmax, width) / spacing).astype(np.int64)
+        self.rows = np.rint(np.linspace(ymin, ymax, height) / spacing).astype(np.int64)
+
+        self.image = np.zeros(self.shape, dtype=RESULT_DTYPE)
+        self.filled = np.zeros(self.shape, dtype=bool)
+        self._ready = []
+        missing = []
+        for ty in np.unique(self.rows // tile_size).tolist():
+            for tx in np.unique(self.cols // tile_size).tolist():
+                tile = cache.get(self.key + (self.level, tx, ty))
+                if tile is None:
+                    missing.append((tx, ty))
+                else:
+                    self._ready.append(self.paint(tx, ty, tile))
+        centre_x = int(self.cols[width // 2]) // tile_size
+        centre_y = int(self.rows[height // 2]) // tile_size
+        missing.sort(key=lambda t: abs(t[0] - centre_x) + abs(t[1] - centre_y))
+
+        slots_shape = (max(len(missing), 1), tile_size, tile_size)
+        super().__init__(slots_shape)
+        self.buffer.fill(UNKNOWN)
+        self.slots = {}
+        for slot, (tx, ty) in enumerate(missing):
+            self.seed_from_parent(slot, tx, ty)
+            future = executor.submit(render_lattice_tile, self.block.name, slots_shape, slot, self.level,
+                                     tx, ty, max_iter, set_type, c)
+            self.slots[future] = (slot, tx, ty)
+            self.futures.append(future)
+        self._pending = list(self.futures)
+
+    @property
+    def done(self):
+        return not self._pending and not self._ready
+
+    def seed_from_parent(self, slot, tx, ty):
+        # Every other point of a tile was already sampled one level up
+        parent = self.cache.get(self.key + (self.level - 1, tx // 2, ty // 2))
+        if parent is None:
+            return
+        half = self.tile_size // 2
+        row0, col0 = (ty % 2) * half, (tx % 2) * half
+        self.buffer[slot, 0::2, 0::2] = parent[row0:row0 + half, col0:col0 + half]
+
+    def paint(self, tx, ty, tile):
+        size = self.tile_size
+        row0, row1 = np.searchsorted(self.rows, [ty * size, (ty + 1) * size]).tolist()
+        col0, col1 = np.searchsorted(self.cols, [tx * size, (tx + 1) * size]).tolist()
+        self.image[row0:row1, col0:col1] = tile[np.ix_(self.rows[row0:row1] - ty * size,
+                                                       self.cols[col0:col1] - tx * size)]
+        self.filled[row0:row1, col0:col1] = True
+        return (row0, row1, col0, col1)
+
+    def completed_tiles(self):
+        # Screen regions painted since the previous call, cached tiles are reported first
+        regions, self._ready = self._ready, []
+        for future in self.finished_futures():
+            if future.cancelled() or not future.result():
+                continue
+            slot, tx, ty = self.slots[future]
+            tile = self.buffer[slot].copy()
+            self.cache.put(self.key + (self.level, tx, ty), tile)
+            regions.append(self.paint(tx, ty, tile))
+        return regions
+
+    def result(self):
+        wait(self.futures)
+        self.completed_tiles()
+        self.close()
+        return self.image
+
+
+class TileRenderer:
+    def __init__(self, workers=None, tile_size=TILE_SIZE, cache_limit=CACHE_LIMIT):
+        self.workers = workers or os.cpu_count()
+        self.tile_size = tile_size
+        self.cache = TileCache(cache_limit)
+        self.executor = None
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def render(self, xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c=None, rows=None):
+        # rows=(start, stop) renders only that band of the view, for images too large to hold at once
+        row0, row1 = rows or (0, height)
+        return RenderJob(self._executor(), width, row1 - row0, render_bands,
+                         ((xmin, xmax, ymin, ymax), max_iter, set_type, c, height, row0), self.tile_size)
+
+    def render_cached(self, xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c=None):
+        # Samples the view on the cache lattice, so tiles are reused across pans, zooms and set toggles
+        return CachedRenderJob(self._executor(), self.cache, (xmin, xmax, ymin, ymax), width, height,
+                               max_iter, set_type, c, self.tile_size)
+
+    def render_perturbation(self, reference, zoom_x, zoom_y, width, height, max_iter, rows=None):
+        # Deep zoom: every tile is iterated as a perturbation of one shared reference orbit
+        row0, row1 = rows or (0, height)
+        return RenderJob(self._executor(), width, row1 - row0, render_perturbation_bands,
+                         (reference, zoom_x, zoom_y, max_iter, height, row0), self.tile_size)
+
+    def compute_set(self, xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c=None):
+        return self.render(xmin, xmax, ymin, ymax, width, height, max_iter, set_type, c).result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+def logistic_step(a, x, tmp):
+    # x <- a * x * (1 - x) in place, evaluated in the same order as the scalar expression
+    np.subtract(1, x, out=tmp)
+    np.multiply(a, x, out=x)
+    np.multiply(x, tmp, out=x)
+    return x
+
+
+def logistic_states(a_values, steps, discard=0, x0=0.5):
+    # Advances every a value at once and yields the state after the transient, then after each
+    # of the following steps. The same array is yielded every time and overwritten by the next step.
+    a = np.asarray(a_values, dtype=np.float64)
+    x = np.full(a.shape, x0, dtype=np.float64)
+    tmp = np.empty_like(x)
+    for _ in range(discard):
+        logistic_step(a, x, tmp)
+    yield x
+    for _ in range(steps):
+        yield logistic_step(a, x, tmp)
+
+
+def logistic_orbits(a_values, steps, discard=0, x0=0.5, out=None):
+    # Row 0 holds x after the discarded transient, row k the k-th iterate after it.
+    # out may be any preallocated (steps + 1, len(a_values)) array, e.g. float32 or a memmap;
+    # the iteration itself always runs in float64.
+    a = np.asarray(a_values, dtype=np.float64)
+    if out is None:
+        out = np.empty((steps + 1,) + a.shape, dtype=np.float64)
+    elif out.shape != (steps + 1,) + a.shape:
+        raise ValueError(f"Expected out of shape {(steps + 1,) + a.shape}, got {out.shape}")
+    for row, x in zip(out, logistic_states(a, steps, discard, x0)):
+        row[...] = x
+    return out
+
+
+def bifurcation_histogram(a_values, steps, discard=0, x0=0.5, bins=(1000, 600), a_range=None, x_range=(0.0, 1.0),
+                          chunk_size=1 << 22):
+    # Counts of (a, x) iterates on a fixed (x bins, a bins) grid, accumulated while iterating.
+    # Bin indices of several steps are gathered in a bounded buffer and counted with one bincount,
+    # so memory does not depend on the number of steps.
+    a = np.asarray(a_values, dtype=np.float64)
+    a_bins, x_bins = bins
+    a_min, a_max = a_range or (a.min(), a.max())
+    x_min, x_max = x_range
+    a_scale = a_bins / (a_max - a_min) if a_max > a_min else 0
+    columns = np.clip(((a - a_min) * a_scale).astype(np.intp), 0, a_bins - 1)
+    # Iterates outside x_range (only possible for a > 4) go to one extra bin that is dropped at the end
+    trash = x_bins * a_bins
+
+    histogram = np.zeros(trash + 1, dtype=np.int64)
+    indices = np.empty((max(chunk_size // max(a.size, 1), 1), a.size), dtype=np.intp)
+    scaled = np.empty(a.size, dtype=np.float64)
+    valid = np.empty(a.size, dtype=bool)
+    filled = 0
+    states = logistic_states(a, steps, discard, x0)
+    next(states)
+    # Orbits for a > 4 leave [0, 1] and overflow, they only ever reach the trash bin
+    with np.errstate(over='ignore', invalid='ignore'):
+        for x in states:
+            # The range is closed like np.histogram2d's, x_max itself (x = 1 at a = 4) counts in the last bin
+            np.less_equal(x, x_max, out=valid)
+            valid &= x >= x_min
+            np.subtract(x, x_min, out=scaled)
+            scaled *= x_bins / (x_max - x_min)
+            np.minimum(scaled, x_bins - 1, out=scaled)
+            row = indices[filled]
+            np.copyto(row, scaled, casting='unsafe', where=valid)
+            row *= a_bins
+            row += columns
+            row[~valid] = trash
+            filled += 1
+            if filled == indices.shape[0]:
+                histogram += np.bincount(indices.reshape(-1), minlength=histogram.size)
+                filled = 0
+    if filled:
+        histogram += np.bincount(indices[:filled].reshape(-1), minlength=histogram.size)
+    return histogram[:trash].reshape(x_bins, a_bins)
+
+
+def sample_transitions(rng, count, orbit_steps=16, discard=100, x0=0.5, a_range=(0.0, 4.0)):
+    # count (a, x) -> x_next pairs: random a values, each contributing orbit_steps consecutive
+    # transitions after the transient, shuffled so one orbit does not fill a batch
+    orbits = -(-count // orbit_steps)
+    a = rng.uniform(*a_range, size=orbits)
+    states = logistic_orbits(a, orbit_steps, discard, x0)
+    X = np.empty((orbits * orbit_steps, 2), dtype=np.float32)
+    X[:, 0] = np.repeat(a, orbit_steps)
+    X[:, 1] = states[:-1].T.reshape(-1)
+    y = states[1:].T.reshape(-1, 1).astype(np.float32)
+    order = rng.permutation(X.shape[0])[:count]
+    return X[order], y[order]
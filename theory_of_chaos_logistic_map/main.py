@@ -1,30 +1,66 @@
 import numpy as np
 import torch
 from torch import nn
-from torch.utils.data import DataLoader, TensorDataset, random_split
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
 import torch.nn.functional as F
 import matplotlib.pyplot as plt
+import argparse
 import os
+import random
+
+from bifurcation import bifurcation_histogram, logistic_orbits, sample_transitions
+from lyapunov import lyapunov_exponents
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 # --- Data Generation ---
 def generate_logistic_regression_data(num_a=500, num_iter=1000, discard=100):
     a_values = np.linspace(0, 4, num=num_a)
-    x_init = 0.5
-    X = []
-    y = []
+    steps = num_iter - discard
+    orbits = logistic_orbits(a_values, steps, discard)
 
-    for a in a_values:
-        x = x_init
-        for _ in range(discard):
-            x = a * x * (1 - x)
-        for _ in range(num_iter - discard):
-            x_next = a * x * (1 - x)
-            X.append([a, x])
-            y.append(x_next)
-            x = x_next
+    # Rows are grouped by a, each a contributing its consecutive (x, x_next) pairs
+    X = np.empty((num_a * steps, 2))
+    X[:, 0] = np.repeat(a_values, steps)
+    X[:, 1] = orbits[:-1].T.reshape(-1)
+    y = orbits[1:].T.reshape(-1)
+    return X, y
+
+class LogisticMapStream(IterableDataset):
+    # Yields ready-made (X, y) batches generated on demand, so the number of samples is not
+    # limited by memory. Batches come from numpy.random.SeedSequence(seed, (epoch, worker)):
+    # with vary_epochs each epoch (see set_epoch) draws new samples, without it every pass
+    # repeats the same stream, which is what a held-out validation set needs.
+    def __init__(self, num_batches, batch_size=128, seed=0, vary_epochs=True, batches_per_chunk=64, **sampling):
+        self.num_batches = num_batches
+        self.batch_size = batch_size
+        self.seed = seed
+        self.vary_epochs = vary_epochs
+        self.batches_per_chunk = batches_per_chunk
+        self.sampling = sampling
+        self.epoch = 0
+
+    def __len__(self):
+        return self.num_batches
+
+    def set_epoch(self, epoch):
+        # Called from the main process, DataLoader workers only see copies of the dataset
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        epoch = self.epoch if self.vary_epochs else 0
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(epoch, worker_id)))
 
-    return np.array(X), np.array(y)
+        # Batches are split between DataLoader workers, samples are drawn a chunk of batches at a time
+        remaining = len(range(worker_id, self.num_batches, workers))
+        while remaining:
+            batches = min(self.batches_per_chunk, remaining)
+            X, y = sample_transitions(rng, batches * self.batch_size, **self.sampling)
+            X, y = torch.from_numpy(X), torch.from_numpy(y)
+            for start in range(0, batches * self.batch_size, self.batch_size):
+                yield X[start:start + self.batch_size], y[start:start + self.batch_size]
+            remaining -= batches
 
 # --- Neural Network ---
 class LogisticMapRegressor(nn.Module):
@@ -42,12 +78,53 @@ class LogisticMapRegressor(nn.Module):
         return self.fc4(x)
 
 # --- Training Function ---
-def train_model(model, train_loader, val_loader, epochs=10):
-    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+def rng_state():
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def save_checkpoint(path, **state):
+    # Written next to the target and renamed, an interrupted save never leaves a broken checkpoint
+    torch.save(state, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def train_model(model, train_loader, val_loader, epochs=10, lr=0.001, patience=3, checkpoint_path="checkpoint.pth",
+                resume=False):
+    # Saves a full checkpoint (model, optimizer, schedule, epoch, early stopping and RNG state) after
+    # every epoch and best_model.pth whenever validation improves. The learning rate is halved after
+    # every epoch without improvement, training stops after patience such epochs in a row.
+    # Both count an epoch as an improvement only if its loss is strictly below the best so far,
+    # threshold=0 makes the scheduler's relative test exactly that.
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=0.5, patience=0, threshold=0)
     criterion = nn.MSELoss()
 
+    start_epoch = 0
     prev_val_loss = float('inf')
-    for epoch in range(epochs):
+    stale_epochs = 0
+    if resume and os.path.exists(checkpoint_path):
+        # Holds more than tensors (RNG states), so it cannot be loaded with weights_only
+        checkpoint = torch.load(checkpoint_path, map_location=device, weights_only=False)
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        set_rng_state(checkpoint['rng'])
+        start_epoch = checkpoint['epoch'] + 1
+        prev_val_loss = checkpoint['best_val_loss']
+        stale_epochs = checkpoint['stale_epochs']
+        print(f"Resuming from epoch {start_epoch + 1} (best validation loss {prev_val_loss / len(val_loader):.6f})")
+
+    for epoch in range(start_epoch, epochs):
+        if hasattr(train_loader.dataset, 'set_epoch'):
+            train_loader.dataset.set_epoch(epoch)
         model.train()
         for X_batch, y_batch in train_loader:
             X_batch, y_batch = X_batch.to(device), y_batch.to(device)
@@ -65,29 +142,52 @@ def train_model(model, train_loader, val_loader, epochs=10):
                 X_batch, y_batch = X_batch.to(device), y_batch.to(device)
                 preds = model(X_batch)
                 val_loss += criterion(preds, y_batch).item()
+        scheduler.step(val_loss)
         if val_loss < prev_val_loss:
             prev_val_loss = val_loss
+            stale_epochs = 0
             print(f"Epoch {epoch + 1}: Validation Loss Improved to {val_loss / len(val_loader):.6f}")
             torch.save(model.state_dict(), "best_model.pth")
+        else:
+            stale_epochs += 1
+
+        finished = stale_epochs >= patience or epoch + 1 == epochs
+        save_checkpoint(checkpoint_path, model=model.state_dict(), optimizer=optimizer.state_dict(),
+                        scheduler=scheduler.state_dict(), rng=rng_state(), epoch=epoch, best_val_loss=prev_val_loss,
+                        stale_epochs=stale_epochs, finished=finished)
+        if stale_epochs >= patience:
+            print(f"Epoch {epoch + 1}: No improvement for {patience} epochs, stopping early")
+            break
 
 # --- Prediction & Visualization ---
 def generate_true_trajectory(a, x0=0.5, steps=100):
-    x_vals = [x0]
-    x = x0
-    for _ in range(steps):
-        x = a * x * (1 - x)
-        x_vals.append(x)
-    return x_vals
+    return logistic_orbits([a], steps, x0=x0)[:, 0].tolist()
 
-def predict_trajectory(model, a, x0=0.5, steps=100):
+@torch.inference_mode()
+def predict_orbits(model, a_values, steps, discard=0, x0=0.5):
+    # Network counterpart of logistic_orbits: every a value is advanced by one batched forward
+    # pass per step. x0 may be a scalar or one starting value per a.
+    # Row 0 holds x after the discarded transient, row k the k-th predicted step after it.
+    # Batched float32 matmuls round differently from one row at a time (up to ~2e-7 per step), so
+    # chaotic orbits drift apart from a per-a rollout while stable ones reach the same attractor.
     model.eval()
-    x_vals = [x0]
-    x = x0
-    for _ in range(steps):
-        inp = torch.tensor([[a, x]], dtype=torch.float32).to(device)
-        with torch.no_grad():
-            x = model(inp).item()
-        x_vals.append(x)
+    a = torch.as_tensor(np.asarray(a_values), dtype=torch.float32, device=device)
+    inputs = torch.empty((a.numel(), 2), dtype=torch.float32, device=device)
+    inputs[:, 0] = a
+    inputs[:, 1] = torch.as_tensor(x0, dtype=torch.float32, device=device)
+    for _ in range(discard):
+        inputs[:, 1] = model(inputs)[:, 0]
+
+    orbits = torch.empty((steps + 1, a.numel()), dtype=torch.float32, device=device)
+    orbits[0] = inputs[:, 1]
+    for step in range(1, steps + 1):
+        orbits[step] = model(inputs)[:, 0]
+        inputs[:, 1] = orbits[step]
+    return orbits.cpu().numpy()
+
+def predict_trajectory(model, a, x0=0.5, steps=100):
+    x_vals = predict_orbits(model, [a], steps, x0=x0)[:, 0].tolist()
+    x_vals[0] = x0
     return x_vals
 
 def plot_trajectories(true_vals, pred_vals, a):
@@ -101,22 +201,18 @@ def plot_trajectories(true_vals, pred_vals, a):
     plt.grid(True)
     plt.show()
 
-def plot_true_bifurcation_diagram(num_a=1000, num_iter=1000, discard=100):
+def plot_true_bifurcation_diagram(num_a=1000, num_iter=1000, discard=100, density=False, bins=(1000, 600)):
     a_values = np.linspace(0, 4, num=num_a)
-    x_init = 0.5
-    data = []
 
-    for a in a_values:
-        x = x_init
-        for _ in range(discard):
-            x = a * x * (1 - x)
-        for _ in range(num_iter - discard):
-            x = a * x * (1 - x)
-            data.append([a, x])
-
-    data = np.array(data)
     plt.figure(figsize=(10, 6))
-    plt.scatter(data[:, 0], data[:, 1], s=0.1, color='black')
+    if density:
+        # Iterates are binned while iterating, memory stays at one histogram however many there are
+        histogram = bifurcation_histogram(a_values, num_iter - discard, discard, bins=bins, a_range=(0, 4))
+        plt.imshow(np.log1p(histogram), extent=(0, 4, 0, 1), origin='lower', aspect='auto', cmap='gray_r',
+                   interpolation='nearest')
+    else:
+        x_values = logistic_orbits(a_values, num_iter - discard, discard)[1:]
+        plt.scatter(np.broadcast_to(a_values, x_values.shape).ravel(), x_values.ravel(), s=0.1, color='black')
     plt.title("True Bifurcation Diagram")
     plt.xlabel("a")
     plt.ylabel("x")
@@ -124,13 +220,12 @@ def plot_true_bifurcation_diagram(num_a=1000, num_iter=1000, discard=100):
     plt.show()
 
 
-def plot_predicted_bifurcation_diagram(model, num_a=1000, num_iter=200, discard=0):
+def plot_predicted_bifurcation_diagram(model, num_a=1000, num_iter=200, discard=0, refresh_every=None):
+    # All a values are rolled out together. Without refresh_every the diagram is drawn once at the end,
+    # otherwise the points of every refresh_every steps are added to the plot as they are predicted.
     a_values = np.linspace(0, 4, num=num_a)
-    x_init = 0.5
-    data = []
-    model.eval()
-    
-    # Create the figure just once before the loop
+    steps = num_iter - discard
+
     plt.figure(figsize=(10, 6))
     plt.title("Predicted Bifurcation Diagram (Neural Net)")
     plt.xlabel("a")
@@ -138,59 +233,91 @@ def plot_predicted_bifurcation_diagram(model, num_a=1000, num_iter=200, discard=
     plt.xlim(0, 4)
     plt.ylim(0, 1)
     plt.grid(True)
-    
-    for i, a in enumerate(a_values):
-        x = x_init
-        for _ in range(discard):
-            inp = torch.tensor([[a, x]], dtype=torch.float32).to(device)
-            with torch.no_grad():
-                x = model(inp).item()
-        
-        for _ in range(num_iter - discard):
-            inp = torch.tensor([[a, x]], dtype=torch.float32).to(device)
-            with torch.no_grad():
-                x = model(inp).item()
-            data.append([a, x])
-        
-        current_data = np.array(data)
-        plt.clf()
-        plt.title(f"Predicted Bifurcation Diagram (Progress: {i+1}/{num_a})")
-        plt.xlabel("a")
-        plt.ylabel("x")
-        plt.xlim(0, 4)
-        plt.ylim(0, 1)
-        plt.grid(True)
-        plt.scatter(current_data[:, 0], current_data[:, 1], s=0.1, color='blue')
-        plt.pause(0.0001)
-    
+
+    block = refresh_every or steps
+    x = predict_orbits(model, a_values, 0, discard)[0]
+    for done in range(0, steps, block):
+        orbits = predict_orbits(model, a_values, min(block, steps - done), x0=x)
+        x = orbits[-1]
+        plt.scatter(np.broadcast_to(a_values, orbits[1:].shape).ravel(), orbits[1:].ravel(), s=0.1, color='blue')
+        if refresh_every:
+            plt.title(f"Predicted Bifurcation Diagram (Progress: {done + orbits.shape[0] - 1}/{steps})")
+            plt.pause(0.0001)
+
     plt.title("Predicted Bifurcation Diagram (Neural Net)")
     plt.show()
 
 
+def predict_lyapunov_exponents(model, a_values, steps=1000, discard=100, x0=0.5):
+    # Exponents of the learned map x -> model(a, x), the mean of ln|d model / dx| along its own orbits,
+    # comparable element by element with lyapunov_exponents. Each output only depends on its own
+    # input row, so the gradient of the summed outputs is every row's derivative at once.
+    model.eval()
+    a = torch.as_tensor(np.asarray(a_values), dtype=torch.float32, device=device)
+    x = torch.full_like(a, x0)
+    total = torch.zeros_like(a)
+    with torch.no_grad():
+        for _ in range(discard):
+            x = model(torch.stack((a, x), dim=1))[:, 0]
+    for _ in range(steps):
+        x = x.detach().requires_grad_(True)
+        x_next = model(torch.stack((a, x), dim=1))[:, 0]
+        derivative, = torch.autograd.grad(x_next.sum(), x)
+        total += derivative.abs().log()
+        x = x_next
+    return (total / steps).cpu().numpy()
+
+def plot_lyapunov_comparison(model, num_a=2000, steps=500, discard=100):
+    a_values = np.linspace(0, 4, num=num_a)
+    true_exponents = lyapunov_exponents(a_values, steps, discard)
+    predicted_exponents = predict_lyapunov_exponents(model, a_values, steps, discard)
+    # Where the signs differ the network is chaotic where the map is not, or the other way round
+    diverging = (true_exponents > 0) != (predicted_exponents > 0)
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(a_values, np.maximum(true_exponents, -5), label='Logistic Map', color='black', linewidth=1)
+    plt.plot(a_values, np.maximum(predicted_exponents, -5), label='Neural Net', color='blue', linewidth=1)
+    plt.fill_between(a_values, -5, 2, where=diverging, color='red', alpha=0.2, label='Different regime')
+    plt.axhline(0, color='gray', linewidth=0.8)
+    plt.title("Lyapunov Exponent")
+    plt.xlabel("a")
+    plt.ylabel("λ")
+    plt.ylim(-5, 2)
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
 # --- Main ---
 def main():
-    # Generate data
-    X_data, y_data = generate_logistic_regression_data()
-    X_tensor = torch.tensor(X_data, dtype=torch.float32)
-    y_tensor = torch.tensor(y_data, dtype=torch.float32).unsqueeze(1)
-
-    dataset = TensorDataset(X_tensor, y_tensor)
-    train_size = int(0.8 * len(dataset))
-    train_dataset, val_dataset = random_split(dataset, [train_size, len(dataset) - train_size])
-    train_loader = DataLoader(train_dataset, batch_size=128, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=128)
-
-    if not os.path.exists('best_model.pth'):
-        # Initialize and train the model
-        print("Training new model...")
-        model = LogisticMapRegressor().to(device)
-        train_model(model, train_loader, val_loader, epochs=10)
-        print("Training completed. Model saved as 'best_model.pth'.")
+    parser = argparse.ArgumentParser(description="Train LogisticMapRegressor and compare it with the logistic map")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--lr', type=float, default=0.001)
+    parser.add_argument('--patience', type=int, default=3, help="epochs without validation improvement before stopping")
+    parser.add_argument('--checkpoint', default="checkpoint.pth")
+    parser.add_argument('--resume', action='store_true', help="continue from the checkpoint even if that run finished")
+    parser.add_argument('--restart', action='store_true', help="train from scratch even if a model or checkpoint exists")
+    args = parser.parse_args()
+
+    # Data is generated on the fly, the validation stream is the same on every pass.
+    # 2813 x 128 training and 704 x 128 validation samples match the old 80/20 split of 450k pairs.
+    train_loader = DataLoader(LogisticMapStream(2813, 128, seed=0), batch_size=None)
+    val_loader = DataLoader(LogisticMapStream(704, 128, seed=1, vary_epochs=False), batch_size=None)
+
+    # An unfinished checkpoint means an interrupted run, which is picked up where it stopped
+    checkpoint = (torch.load(args.checkpoint, map_location=device, weights_only=False)
+                  if os.path.exists(args.checkpoint) else None)
+    resume = checkpoint is not None and not args.restart and (args.resume or not checkpoint['finished'])
+    model = LogisticMapRegressor().to(device)
+    if args.restart or resume or not os.path.exists('best_model.pth'):
+        print("Resuming interrupted training..." if resume else "Training new model...")
+        train_model(model, train_loader, val_loader, epochs=args.epochs, lr=args.lr, patience=args.patience,
+                    checkpoint_path=args.checkpoint, resume=resume)
+        print("Training completed. Best model saved as 'best_model.pth'.")
     else:
-        model = LogisticMapRegressor().to(device)
-        model.load_state_dict(torch.load('best_model.pth'))
-        model.eval()
         print("Loaded existing model.")
+    model.load_state_dict(torch.load('best_model.pth', map_location=device))
+    model.eval()
 
     # Predict & Plot
     a_test = 3.7
@@ -200,8 +327,9 @@ def main():
     pred_vals = predict_trajectory(model, a_test, x0, steps)
     plot_trajectories(true_vals, pred_vals, a_test)
 
-    plot_true_bifurcation_diagram()
+    plot_true_bifurcation_diagram(num_a=20000, density=True)
     plot_predicted_bifurcation_diagram(model)
+    plot_lyapunov_comparison(model)
 
 if __name__ == '__main__':
     main()